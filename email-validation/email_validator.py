@@ -1,16 +1,79 @@
 """Email validation module with syntax, DNS, and SMTP verification."""
 
-import re
-import smtplib
-import socket
-from typing import Optional
+import asyncio
+import string
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import aiosmtplib
+import dns.asyncresolver
 import dns.resolver
 import dns.exception
 
+# Shared resolver so dnspython's answer cache and resolv.conf parsing are
+# reused across lookups instead of redone per query
+_resolver = dns.asyncresolver.Resolver()
+_resolver.cache = dns.resolver.LRUCache(10_000)
+_resolver.lifetime = 5.0
+
+# MX lookups currently in flight, keyed by domain, so concurrent requests
+# for the same domain share a single DNS query
+_pending_mx_lookups: Dict[str, "asyncio.Future[Optional[str]]"] = {}
+
+# Resolved MX answers, keyed by domain, as (hostname or None, expiry on the
+# monotonic clock). Entries live for the record's DNS TTL and the least
+# recently used domain is evicted once the cache is full.
+_mx_cache: "OrderedDict[str, Tuple[Optional[str], float]]" = OrderedDict()
+MX_CACHE_MAX_SIZE = 10_000
+# How long to remember domains that don't exist or have no MX records
+NEGATIVE_MX_TTL = 60
+
+# Characters allowed in each part of an address (simplified RFC 5322)
+_LOCAL_CHARS = frozenset(string.ascii_letters + string.digits + "._%+-")
+_DOMAIN_CHARS = frozenset(string.ascii_letters + string.digits + ".-")
+_TLD_CHARS = frozenset(string.ascii_letters)
+
+# Longest address accepted by SMTP (RFC 5321 forward-path limit)
+MAX_EMAIL_LENGTH = 254
+
+# Well-known disposable/throwaway mailbox providers
+DISPOSABLE_DOMAINS = frozenset({
+    "10minutemail.com",
+    "discard.email",
+    "dispostable.com",
+    "getnada.com",
+    "guerrillamail.com",
+    "mailinator.com",
+    "maildrop.cc",
+    "sharklasers.com",
+    "temp-mail.org",
+    "tempmail.com",
+    "throwawaymail.com",
+    "trashmail.com",
+    "yopmail.com",
+})
+
+# Idle SMTP connections, keyed by MX server, as (connection, time last used)
+# so repeat verifications against one server skip the connect and EHLO
+_smtp_pool: Dict[str, List[Tuple[aiosmtplib.SMTP, float]]] = {}
+# Per-MX server limits on concurrent SMTP sessions, to stay under the
+# connection rate limits mail servers apply to unknown clients. Entries are
+# dropped once no verification is using or waiting on them, tracked by the
+# per-host user counts, so the maps only hold hosts currently being checked.
+_smtp_host_semaphores: Dict[str, asyncio.Semaphore] = {}
+_smtp_host_users: Dict[str, int] = {}
+SMTP_MAX_SESSIONS_PER_HOST = 2
+# Seconds an idle connection is kept before it is closed
+SMTP_IDLE_TIMEOUT = 60
+
 
 def is_valid_syntax(email: str) -> bool:
     """
-    Validate email syntax using regex pattern.
+    Validate email syntax with a single linear scan (no regex backtracking).
+
+    Accepts local@domain.tld of at most MAX_EMAIL_LENGTH characters, where
+    the local part uses letters, digits and ._%+-, the domain uses letters,
+    digits, dots and hyphens, and the TLD is at least two letters.
 
     Args:
         email: Email address to validate
@@ -21,16 +84,42 @@ def is_valid_syntax(email: str) -> bool:
     if not email or not isinstance(email, str):
         return False
 
-    # RFC 5322 compliant email regex pattern (simplified)
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
+    # Cheap rejects before scanning: too long for SMTP, or no '@' at all
+    if len(email) > MAX_EMAIL_LENGTH or '@' not in email:
+        return False
+
+    local, _, domain = email.partition('@')
+    if not local or not _LOCAL_CHARS.issuperset(local):
+        return False
+    if not _DOMAIN_CHARS.issuperset(domain):
+        return False
+
+    dot = domain.rfind('.')
+    tld = domain[dot + 1:]
+    return dot > 0 and len(tld) >= 2 and _TLD_CHARS.issuperset(tld)
+
+
+def is_disposable_domain(domain: str) -> bool:
+    """
+    Check whether domain belongs to a known disposable email provider.
+
+    Args:
+        domain: Domain name to check
 
-    return bool(re.match(pattern, email))
+    Returns:
+        True if the domain is a known disposable provider, False otherwise
+    """
+    return domain.lower() in DISPOSABLE_DOMAINS
 
 
-def get_mx_record(domain: str) -> Optional[str]:
+async def get_mx_record(domain: str) -> Optional[str]:
     """
     Perform DNS lookup to get MX record for domain.
 
+    Answers are cached for the DNS record's TTL (negative answers for
+    NEGATIVE_MX_TTL seconds), and concurrent lookups for the same domain
+    await one shared query.
+
     Args:
         domain: Domain name to lookup
 
@@ -40,33 +129,79 @@ def get_mx_record(domain: str) -> Optional[str]:
     if not domain or not isinstance(domain, str):
         return None
 
+    cached = _mx_cache.get(domain)
+    if cached is not None:
+        mx_server, expires_at = cached
+        if expires_at > time.monotonic():
+            _mx_cache.move_to_end(domain)
+            return mx_server
+        del _mx_cache[domain]
+
+    lookup = _pending_mx_lookups.get(domain)
+    if lookup is None:
+        lookup = asyncio.ensure_future(_lookup_and_cache_mx_record(domain))
+        _pending_mx_lookups[domain] = lookup
+        lookup.add_done_callback(lambda _: _pending_mx_lookups.pop(domain, None))
+
+    # Shield the shared lookup so one cancelled caller doesn't cancel it for the rest
+    return await asyncio.shield(lookup)
+
+
+async def _lookup_and_cache_mx_record(domain: str) -> Optional[str]:
+    """Query the MX record for domain and cache the answer for its TTL."""
+    mx_server, ttl = await _query_mx_record(domain)
+
+    if ttl > 0:
+        _mx_cache[domain] = (mx_server, time.monotonic() + ttl)
+        _mx_cache.move_to_end(domain)
+        if len(_mx_cache) > MX_CACHE_MAX_SIZE:
+            _mx_cache.popitem(last=False)
+
+    return mx_server
+
+
+async def _query_mx_record(domain: str) -> Tuple[Optional[str], int]:
+    """
+    Resolve the highest priority MX hostname for domain.
+
+    Returns:
+        Tuple of (MX hostname or None, seconds the answer may be cached).
+        Inconclusive DNS failures return a TTL of 0 so they aren't cached.
+    """
     try:
         # Query MX records for the domain
-        mx_records = dns.resolver.resolve(domain, 'MX')
+        answer = await _resolver.resolve(domain, 'MX')
 
         # Sort by priority (lower value = higher priority)
-        mx_records = sorted(mx_records, key=lambda r: r.preference)
+        mx_records = sorted(answer, key=lambda r: r.preference)
 
         if mx_records:
             # Return the hostname of the highest priority MX server
-            return str(mx_records[0].exchange).rstrip('.')
+            return str(mx_records[0].exchange).rstrip('.'), answer.rrset.ttl
 
-        return None
+        return None, NEGATIVE_MX_TTL
 
-    except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer, dns.resolver.NoNameservers,
-            dns.exception.Timeout, Exception):
-        # Domain doesn't exist, no MX records, or DNS error
-        return None
+    except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
+        # Domain doesn't exist or has no MX records
+        return None, NEGATIVE_MX_TTL
+
+    except (dns.resolver.NoNameservers, dns.exception.Timeout, Exception):
+        # DNS error - try again on the next lookup
+        return None, 0
 
 
-def verify_mailbox(email: str, mx_server: str, timeout: int = 10) -> Optional[bool]:
+async def verify_mailbox(email: str, mx_server: str, timeout: int = 10) -> Optional[bool]:
     """
     Verify if mailbox exists using SMTP without sending email.
 
+    At most SMTP_MAX_SESSIONS_PER_HOST verifications run against one MX
+    server at a time; connections are pooled per server and reset between
+    recipients.
+
     Args:
         email: Email address to verify
         mx_server: MX server hostname to connect to
-        timeout: Connection timeout in seconds
+        timeout: Timeout in seconds for connecting and for each SMTP command
 
     Returns:
         True if mailbox exists, False if doesn't exist, None if verification failed
@@ -74,25 +209,53 @@ def verify_mailbox(email: str, mx_server: str, timeout: int = 10) -> Optional[bo
     if not email or not mx_server:
         return None
 
+    semaphore = _smtp_host_semaphores.get(mx_server)
+    if semaphore is None:
+        semaphore = _smtp_host_semaphores[mx_server] = asyncio.Semaphore(SMTP_MAX_SESSIONS_PER_HOST)
+    _smtp_host_users[mx_server] = _smtp_host_users.get(mx_server, 0) + 1
+
     try:
-        # Set socket timeout
-        socket.setdefaulttimeout(timeout)
+        async with semaphore:
+            return await _check_recipient(email, mx_server, timeout)
+    finally:
+        _smtp_host_users[mx_server] -= 1
+        if not _smtp_host_users[mx_server]:
+            del _smtp_host_users[mx_server]
+            del _smtp_host_semaphores[mx_server]
+
 
-        # Connect to the mail server
-        server = smtplib.SMTP(timeout=timeout)
-        server.connect(mx_server)
+async def _check_recipient(email: str, mx_server: str, timeout: int) -> Optional[bool]:
+    """Run MAIL/RCPT for email on a pooled or new connection to mx_server."""
+    server = None
+    reusable = False
+
+    try:
+        server = await _checkout_smtp_connection(mx_server)
+        if server is None:
+            # Plain SMTP on port 25; the timeout applies to connect and each command
+            server = aiosmtplib.SMTP(hostname=mx_server, port=25, timeout=timeout, start_tls=False)
 
-        # Identify ourselves
-        server.helo()
+            # Connect to the mail server
+            await server.connect()
+
+            # Identify ourselves
+            await server.helo()
 
         # Provide a sender address (required for RCPT TO)
-        server.mail('verify@example.com')
+        await server.mail('verify@example.com')
 
         # Check if recipient exists
-        code, message = server.rcpt(email)
+        try:
+            code = (await server.rcpt(email)).code
+        except aiosmtplib.SMTPRecipientRefused as e:
+            code = e.code
 
-        # Close connection
-        server.quit()
+        # Clear the envelope so the connection can verify the next recipient
+        try:
+            await server.rset()
+            reusable = True
+        except (aiosmtplib.SMTPException, OSError):
+            pass
 
         # 250 = success, mailbox exists
         # 550 = mailbox doesn't exist
@@ -104,12 +267,60 @@ def verify_mailbox(email: str, mx_server: str, timeout: int = 10) -> Optional[bo
         else:
             return None
 
-    except (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError,
-            socket.timeout, socket.gaierror, OSError, Exception):
+    except (aiosmtplib.SMTPException, asyncio.TimeoutError, OSError, Exception):
         # Connection failed or other error - inconclusive
         return None
     finally:
-        try:
-            server.quit()
-        except:
-            pass
+        if server is not None:
+            if reusable:
+                _release_smtp_connection(mx_server, server)
+            else:
+                # close() drops the socket without waiting on a QUIT round trip
+                server.close()
+
+
+async def _checkout_smtp_connection(mx_server: str) -> Optional[aiosmtplib.SMTP]:
+    """Take a live idle connection to mx_server from the pool, if there is one."""
+    _reap_idle_smtp_connections(time.monotonic())
+    idle = _smtp_pool.get(mx_server)
+
+    while idle:
+        server, last_used = idle.pop()
+
+        if time.monotonic() - last_used < SMTP_IDLE_TIMEOUT and server.is_connected:
+            # Servers drop idle clients, so probe before reusing
+            try:
+                await server.noop()
+                return server
+            except (aiosmtplib.SMTPException, OSError):
+                pass
+            except BaseException:
+                # Don't leak the socket when the caller sees the error instead
+                server.close()
+                raise
+
+        server.close()
+
+    return None
+
+
+def _release_smtp_connection(mx_server: str, server: aiosmtplib.SMTP) -> None:
+    """Return a connection to the pool, closing any that have been idle too long."""
+    now = time.monotonic()
+    _reap_idle_smtp_connections(now)
+
+    # The host semaphore already caps how many connections can be returned
+    _smtp_pool.setdefault(mx_server, []).append((server, now))
+
+
+def _reap_idle_smtp_connections(now: float) -> None:
+    """Close pooled connections to any host that have been idle too long."""
+    for host in list(_smtp_pool):
+        idle = _smtp_pool[host]
+        for conn, last_used in idle:
+            if now - last_used >= SMTP_IDLE_TIMEOUT:
+                conn.close()
+        idle[:] = [(conn, last_used) for conn, last_used in idle
+                   if now - last_used < SMTP_IDLE_TIMEOUT]
+        if not idle:
+            del _smtp_pool[host]
@@ -1,9 +1,11 @@
 """FastAPI server for email validation."""
 
+import asyncio
+
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel, Field
-from typing import Optional
-from email_validator import is_valid_syntax, get_mx_record, verify_mailbox
+from typing import List, Optional
+from email_validator import is_valid_syntax, is_disposable_domain, get_mx_record, verify_mailbox
 
 app = FastAPI(
     title="Email Validation API",
@@ -12,6 +14,10 @@ app = FastAPI(
 )
 
 
+# Largest number of addresses accepted by one /validate_batch call
+MAX_BATCH_SIZE = 100
+
+
 class EmailValidationRequest(BaseModel):
     """Request model for email validation."""
     email: str = Field(..., description="Email address to validate")
@@ -39,18 +45,19 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "/validate": "POST - Validate an email address",
+            "/validate_batch": "POST - Validate a list of email addresses",
             "/docs": "GET - API documentation",
         }
     }
 
 
 @app.post("/validate", response_model=EmailValidationResponse)
-async def validate_email(request: EmailValidationRequest):
+async def validate_email(request: EmailValidationRequest) -> EmailValidationResponse:
     """
     Validate an email address.
 
     Performs the following checks:
-    1. Syntax validation using regex
+    1. Syntax validation (including the RFC 5321 length limit)
     2. DNS MX record lookup
     3. Optional SMTP mailbox verification
 
@@ -68,50 +75,76 @@ async def validate_email(request: EmailValidationRequest):
     if not email:
         raise HTTPException(status_code=400, detail="Email address is required")
 
+    return await _validate_one(email, request.verify_smtp)
+
+
+@app.post("/validate_batch", response_model=List[EmailValidationResponse])
+async def validate_email_batch(requests: List[EmailValidationRequest]) -> List[EmailValidationResponse]:
+    """
+    Validate a list of email addresses concurrently.
+
+    Each address goes through the same checks as /validate. Addresses on the
+    same domain share one MX lookup and SMTP probes reuse pooled connections
+    per MX server. Empty addresses are reported as invalid syntax rather than
+    failing the whole batch.
+
+    Args:
+        requests: Email validation requests, at most MAX_BATCH_SIZE
+
+    Returns:
+        Validation results in the same order as the requests
+
+    Raises:
+        HTTPException: If the batch is too large or validation encounters an error
+    """
+    if len(requests) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_BATCH_SIZE} email addresses can be validated per batch"
+        )
+
+    return list(await asyncio.gather(*(
+        _validate_one(request.email.strip(), request.verify_smtp) for request in requests
+    )))
+
+
+async def _validate_one(email: str, verify_smtp: bool) -> EmailValidationResponse:
+    """Run syntax, MX and optional SMTP checks for one stripped address."""
     # Step 1: Syntax validation
     syntax_valid = is_valid_syntax(email)
 
-    # Initialize response
-    response = {
-        "email": email,
-        "is_valid_syntax": syntax_valid,
-        "has_mx_record": False,
-        "mx_server": None,
-        "mailbox_verified": None,
-        "overall_valid": False
-    }
-
     # If syntax is invalid, return early
     if not syntax_valid:
-        return response
+        return EmailValidationResponse(
+            email=email, is_valid_syntax=False, has_mx_record=False, overall_valid=False
+        )
 
-    # Step 2: Extract domain and check MX record
-    try:
-        domain = email.split('@')[1]
-        mx_server = get_mx_record(domain)
+    # Reject throwaway providers without any network I/O
+    domain = email.rpartition('@')[2]
+    if is_disposable_domain(domain):
+        return EmailValidationResponse(
+            email=email, is_valid_syntax=True, has_mx_record=False, overall_valid=False
+        )
 
-        response["has_mx_record"] = mx_server is not None
-        response["mx_server"] = mx_server
+    # Step 2: Check MX record for the domain
+    try:
+        mx_server = await get_mx_record(domain)
+        mailbox_result = None
 
         # If no MX record, email is invalid
         if not mx_server:
-            return response
+            overall_valid = False
 
         # Step 3: Optional SMTP mailbox verification
-        if request.verify_smtp:
-            mailbox_result = verify_mailbox(email, mx_server)
-            response["mailbox_verified"] = mailbox_result
+        elif verify_smtp:
+            mailbox_result = await verify_mailbox(email, mx_server)
 
             # Overall valid if syntax is valid, has MX record, and mailbox exists
             # If mailbox_verified is None (inconclusive), consider valid if other checks pass
-            response["overall_valid"] = (
-                syntax_valid and
-                mx_server is not None and
-                (mailbox_result is True or mailbox_result is None)
-            )
+            overall_valid = mailbox_result is True or mailbox_result is None
         else:
             # Without SMTP verification, valid if syntax and MX record are good
-            response["overall_valid"] = syntax_valid and mx_server is not None
+            overall_valid = True
 
     except Exception as e:
         raise HTTPException(
@@ -119,7 +152,14 @@ async def validate_email(request: EmailValidationRequest):
             detail=f"Error during validation: {str(e)}"
         )
 
-    return response
+    return EmailValidationResponse(
+        email=email,
+        is_valid_syntax=True,
+        has_mx_record=mx_server is not None,
+        mx_server=mx_server,
+        mailbox_verified=mailbox_result,
+        overall_valid=overall_valid
+    )
 
 
 @app.get("/health")
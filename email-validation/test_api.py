@@ -1,11 +1,39 @@
 """Tests for FastAPI email validation server."""
 
+import asyncio
+
 import pytest
+import pytest_asyncio
 from fastapi.testclient import TestClient
-from main import app
+from httpx import ASGITransport, AsyncClient
+from main import MAX_BATCH_SIZE, app
 
 client = TestClient(app)
 
+# /validate request bodies, keyed by the test that checks the response
+VALIDATE_REQUESTS = {
+    "valid_email_syntax_only": {"email": "test@gmail.com", "verify_smtp": False},
+    "invalid_syntax": {"email": "invalid-email", "verify_smtp": False},
+    "invalid_domain": {"email": "test@nonexistentdomain12345.com", "verify_smtp": False},
+    "disposable_domain": {"email": "test@mailinator.com", "verify_smtp": False},
+    "overlong_email": {"email": "a" * 250 + "@example.com", "verify_smtp": False},
+    "empty_email": {"email": "", "verify_smtp": False},
+    "with_whitespace": {"email": "  test@gmail.com  ", "verify_smtp": False},
+    "missing_email_field": {"verify_smtp": False},
+    "default_verify_smtp_false": {"email": "test@gmail.com"},
+}
+
+
+@pytest_asyncio.fixture(scope="module", loop_scope="module")
+async def validate_responses():
+    """Send every VALIDATE_REQUESTS body concurrently and return responses by name."""
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as async_client:
+        responses = await asyncio.gather(*(
+            async_client.post("/validate", json=body) for body in VALIDATE_REQUESTS.values()
+        ))
+    return dict(zip(VALIDATE_REQUESTS, responses))
+
 
 class TestRootEndpoint:
     """Test root endpoint."""
@@ -33,12 +61,9 @@ class TestHealthCheck:
 class TestValidateEndpoint:
     """Test email validation endpoint."""
 
-    def test_validate_valid_email_syntax_only(self):
+    def test_validate_valid_email_syntax_only(self, validate_responses):
         """Test validation with valid email syntax."""
-        response = client.post(
-            "/validate",
-            json={"email": "test@gmail.com", "verify_smtp": False}
-        )
+        response = validate_responses["valid_email_syntax_only"]
         assert response.status_code == 200
         data = response.json()
         assert data["email"] == "test@gmail.com"
@@ -48,12 +73,9 @@ class TestValidateEndpoint:
         assert data["mailbox_verified"] is None
         assert data["overall_valid"] is True
 
-    def test_validate_invalid_syntax(self):
+    def test_validate_invalid_syntax(self, validate_responses):
         """Test validation with invalid email syntax."""
-        response = client.post(
-            "/validate",
-            json={"email": "invalid-email", "verify_smtp": False}
-        )
+        response = validate_responses["invalid_syntax"]
         assert response.status_code == 200
         data = response.json()
         assert data["email"] == "invalid-email"
@@ -61,52 +83,87 @@ class TestValidateEndpoint:
         assert data["has_mx_record"] is False
         assert data["overall_valid"] is False
 
-    def test_validate_invalid_domain(self):
+    def test_validate_invalid_domain(self, validate_responses):
         """Test validation with non-existent domain."""
-        response = client.post(
-            "/validate",
-            json={"email": "test@nonexistentdomain12345.com", "verify_smtp": False}
-        )
+        response = validate_responses["invalid_domain"]
         assert response.status_code == 200
         data = response.json()
         assert data["is_valid_syntax"] is True
         assert data["has_mx_record"] is False
         assert data["overall_valid"] is False
 
-    def test_validate_empty_email(self):
+    def test_validate_disposable_domain(self, validate_responses):
+        """Test disposable domains are rejected without an MX lookup."""
+        response = validate_responses["disposable_domain"]
+        assert response.status_code == 200
+        data = response.json()
+        assert data["is_valid_syntax"] is True
+        assert data["has_mx_record"] is False
+        assert data["overall_valid"] is False
+
+    def test_validate_overlong_email(self, validate_responses):
+        """Test addresses over the RFC 5321 length limit are rejected."""
+        response = validate_responses["overlong_email"]
+        assert response.status_code == 200
+        data = response.json()
+        assert data["overall_valid"] is False
+
+    def test_validate_empty_email(self, validate_responses):
         """Test validation with empty email."""
-        response = client.post(
-            "/validate",
-            json={"email": "", "verify_smtp": False}
-        )
+        response = validate_responses["empty_email"]
         assert response.status_code == 400
         assert "Email address is required" in response.json()["detail"]
 
-    def test_validate_with_whitespace(self):
+    def test_validate_with_whitespace(self, validate_responses):
         """Test validation trims whitespace."""
-        response = client.post(
-            "/validate",
-            json={"email": "  test@gmail.com  ", "verify_smtp": False}
-        )
+        response = validate_responses["with_whitespace"]
         assert response.status_code == 200
         data = response.json()
         assert data["email"] == "test@gmail.com"
         assert data["is_valid_syntax"] is True
 
-    def test_validate_missing_email_field(self):
+    def test_validate_missing_email_field(self, validate_responses):
         """Test validation without email field."""
-        response = client.post(
-            "/validate",
-            json={"verify_smtp": False}
-        )
+        response = validate_responses["missing_email_field"]
         assert response.status_code == 422  # Validation error
 
-    def test_validate_default_verify_smtp_false(self):
+    def test_validate_default_verify_smtp_false(self, validate_responses):
         """Test that verify_smtp defaults to False."""
+        response = validate_responses["default_verify_smtp_false"]
+        assert response.status_code == 200
+        data = response.json()
+        assert data["mailbox_verified"] is None  # Should not be verified by default
+
+
+class TestValidateBatchEndpoint:
+    """Test batch email validation endpoint."""
+
+    def test_validate_batch_preserves_order(self):
+        """Test batch results come back in request order."""
         response = client.post(
-            "/validate",
-            json={"email": "test@gmail.com"}
+            "/validate_batch",
+            json=[
+                {"email": "invalid-email"},
+                {"email": "test@mailinator.com"},
+                {"email": ""},
+            ]
         )
         assert response.status_code == 200
         data = response.json()
-        assert data["mailbox_verified"] is None  # Should not be verified by default
+        assert [item["email"] for item in data] == ["invalid-email", "test@mailinator.com", ""]
+        assert [item["is_valid_syntax"] for item in data] == [False, True, False]
+        assert all(item["overall_valid"] is False for item in data)
+
+    def test_validate_batch_empty_list(self):
+        """Test an empty batch returns an empty list."""
+        response = client.post("/validate_batch", json=[])
+        assert response.status_code == 200
+        assert response.json() == []
+
+    def test_validate_batch_too_large(self):
+        """Test batches over MAX_BATCH_SIZE are rejected."""
+        response = client.post(
+            "/validate_batch",
+            json=[{"email": "invalid-email"}] * (MAX_BATCH_SIZE + 1)
+        )
+        assert response.status_code == 400
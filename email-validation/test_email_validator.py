@@ -1,83 +1,246 @@
 """Tests for email validation functionality."""
 
+import asyncio
+import time
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import aiosmtplib
 import pytest
-from email_validator import is_valid_syntax, get_mx_record, verify_mailbox
+import email_validator
+from email_validator import is_valid_syntax, is_disposable_domain, get_mx_record, verify_mailbox
 
 
 class TestSyntaxValidation:
     """Test email syntax validation."""
 
-    def test_valid_email_basic(self):
-        """Test basic valid email format."""
-        assert is_valid_syntax("test@example.com") is True
-
-    def test_valid_email_with_subdomain(self):
-        """Test valid email with subdomain."""
-        assert is_valid_syntax("user@mail.example.com") is True
-
-    def test_valid_email_with_plus(self):
-        """Test valid email with plus sign."""
-        assert is_valid_syntax("user+tag@example.com") is True
-
-    def test_valid_email_with_numbers(self):
-        """Test valid email with numbers."""
-        assert is_valid_syntax("user123@example123.com") is True
-
-    def test_invalid_email_no_at(self):
-        """Test invalid email without @ symbol."""
-        assert is_valid_syntax("userexample.com") is False
-
-    def test_invalid_email_no_domain(self):
-        """Test invalid email without domain."""
-        assert is_valid_syntax("user@") is False
-
-    def test_invalid_email_no_local(self):
-        """Test invalid email without local part."""
-        assert is_valid_syntax("@example.com") is False
-
-    def test_invalid_email_double_at(self):
-        """Test invalid email with double @ symbol."""
-        assert is_valid_syntax("user@@example.com") is False
-
-    def test_invalid_email_spaces(self):
-        """Test invalid email with spaces."""
-        assert is_valid_syntax("user @example.com") is False
-
-    def test_empty_string(self):
-        """Test empty string."""
-        assert is_valid_syntax("") is False
+    @pytest.mark.parametrize("email,expected", [
+        pytest.param("test@example.com", True, id="basic"),
+        pytest.param("user@mail.example.com", True, id="subdomain"),
+        pytest.param("user+tag@example.com", True, id="plus"),
+        pytest.param("user123@example123.com", True, id="numbers"),
+        pytest.param("a" * 64 + "@" + "b" * 185 + ".com", True, id="max_length"),
+        pytest.param("userexample.com", False, id="no_at"),
+        pytest.param("user@", False, id="no_domain"),
+        pytest.param("@example.com", False, id="no_local"),
+        pytest.param("user@@example.com", False, id="double_at"),
+        pytest.param("user @example.com", False, id="spaces"),
+        pytest.param("", False, id="empty_string"),
+        pytest.param("user@example.c", False, id="single_letter_tld"),
+        pytest.param("user@example.123", False, id="numeric_tld"),
+        pytest.param("a" * 64 + "@" + "b" * 186 + ".com", False, id="too_long"),
+        pytest.param("user@example.com\n", False, id="trailing_newline"),
+    ])
+    def test_syntax(self, email, expected):
+        """Test is_valid_syntax accepts or rejects each address as expected."""
+        assert is_valid_syntax(email) is expected
+
+
+class TestDisposableDomains:
+    """Test disposable domain detection."""
+
+    def test_known_disposable_domain(self):
+        """Test a known disposable provider is detected regardless of case."""
+        assert is_disposable_domain("mailinator.com") is True
+        assert is_disposable_domain("Mailinator.COM") is True
+
+    def test_regular_domain(self):
+        """Test a regular domain is not flagged."""
+        assert is_disposable_domain("gmail.com") is False
 
 
 class TestMXRecordValidation:
     """Test MX record lookup."""
 
-    def test_valid_domain_with_mx(self):
+    @pytest.fixture(autouse=True)
+    def clear_mx_cache(self):
+        """Start each test with an empty MX cache."""
+        email_validator._mx_cache.clear()
+        yield
+        email_validator._mx_cache.clear()
+
+    @pytest.mark.asyncio
+    async def test_valid_domain_with_mx(self):
         """Test domain with valid MX records."""
-        mx_record = get_mx_record("gmail.com")
+        mx_record = await get_mx_record("gmail.com")
         assert mx_record is not None
         assert len(mx_record) > 0
 
-    def test_invalid_domain_no_mx(self):
+    @pytest.mark.asyncio
+    async def test_invalid_domain_no_mx(self):
         """Test invalid domain without MX records."""
-        mx_record = get_mx_record("this-domain-definitely-does-not-exist-12345.com")
+        mx_record = await get_mx_record("this-domain-definitely-does-not-exist-12345.com")
         assert mx_record is None
 
-    def test_empty_domain(self):
+    @pytest.mark.asyncio
+    async def test_empty_domain(self):
         """Test empty domain."""
-        mx_record = get_mx_record("")
+        mx_record = await get_mx_record("")
         assert mx_record is None
 
+    @pytest.mark.asyncio
+    async def test_concurrent_lookups_share_query(self):
+        """Test concurrent lookups for one domain issue a single DNS query."""
+        with patch("email_validator._query_mx_record",
+                   new=AsyncMock(return_value=("mx.example.com", 300))) as mock_query:
+            results = await asyncio.gather(
+                get_mx_record("example.com"),
+                get_mx_record("example.com")
+            )
+
+        assert results == ["mx.example.com", "mx.example.com"]
+        assert mock_query.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_repeat_lookup_served_from_cache(self):
+        """Test a repeat lookup within the TTL doesn't query DNS again."""
+        with patch("email_validator._query_mx_record",
+                   new=AsyncMock(return_value=("mx.example.com", 300))) as mock_query:
+            assert await get_mx_record("example.com") == "mx.example.com"
+            assert await get_mx_record("example.com") == "mx.example.com"
+
+        assert mock_query.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_expired_entry_is_requeried(self):
+        """Test a cached answer past its TTL triggers a fresh lookup."""
+        email_validator._mx_cache["example.com"] = ("old.example.com", 0.0)
+
+        with patch("email_validator._query_mx_record",
+                   new=AsyncMock(return_value=("mx.example.com", 300))) as mock_query:
+            assert await get_mx_record("example.com") == "mx.example.com"
+
+        assert mock_query.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_dns_failure_not_cached(self):
+        """Test inconclusive DNS failures are retried rather than cached."""
+        with patch("email_validator._query_mx_record",
+                   new=AsyncMock(return_value=(None, 0))) as mock_query:
+            assert await get_mx_record("example.com") is None
+            assert await get_mx_record("example.com") is None
+
+        assert mock_query.await_count == 2
+
 
 class TestMailboxVerification:
     """Test SMTP mailbox verification."""
 
-    def test_verify_mailbox_timeout(self):
+    @pytest.fixture(autouse=True)
+    def clear_smtp_pool(self):
+        """Start each test without pooled connections or host limits."""
+        email_validator._smtp_pool.clear()
+        email_validator._smtp_host_semaphores.clear()
+        email_validator._smtp_host_users.clear()
+        yield
+        email_validator._smtp_pool.clear()
+        email_validator._smtp_host_semaphores.clear()
+        email_validator._smtp_host_users.clear()
+
+    @staticmethod
+    def _mock_server(rcpt_code=250):
+        """Build a mock aiosmtplib connection answering RCPT with rcpt_code."""
+        server = MagicMock()
+        server.is_connected = True
+        for command in ("connect", "helo", "mail", "rset", "noop"):
+            setattr(server, command, AsyncMock(return_value=SimpleNamespace(code=250)))
+        server.rcpt = AsyncMock(return_value=SimpleNamespace(code=rcpt_code))
+        return server
+
+    @pytest.mark.asyncio
+    async def test_verify_mailbox_timeout(self):
         """Test mailbox verification with timeout handling."""
         # This should handle timeout gracefully
-        result = verify_mailbox("test@example.com", "nonexistent-server.example.com")
+        result = await verify_mailbox("test@example.com", "nonexistent-server.example.com")
         assert result in [True, False, None]  # Accept any result, just shouldn't crash
 
-    def test_verify_mailbox_invalid_server(self):
+    @pytest.mark.asyncio
+    async def test_verify_mailbox_invalid_server(self):
         """Test mailbox verification with invalid server."""
-        result = verify_mailbox("test@example.com", "")
+        result = await verify_mailbox("test@example.com", "")
         assert result is False or result is None
+
+    @pytest.mark.asyncio
+    async def test_connection_reused_for_same_server(self):
+        """Test repeat verifications against one MX server share a connection."""
+        server = self._mock_server()
+
+        with patch("email_validator.aiosmtplib.SMTP", return_value=server) as mock_smtp:
+            assert await verify_mailbox("a@example.com", "mx.example.com") is True
+            assert await verify_mailbox("b@example.com", "mx.example.com") is True
+
+        assert mock_smtp.call_count == 1
+        server.connect.assert_awaited_once()
+        assert server.rset.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_failed_liveness_probe_is_inconclusive(self):
+        """Test an unexpected error probing a pooled connection returns None."""
+        server = self._mock_server()
+        server.noop.side_effect = RuntimeError("probe failed")
+        email_validator._smtp_pool["mx.example.com"] = [(server, time.monotonic())]
+
+        assert await verify_mailbox("a@example.com", "mx.example.com") is None
+        server.close.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_refused_recipient(self):
+        """Test a 550 refusal reports the mailbox as missing."""
+        server = self._mock_server()
+        server.rcpt.side_effect = aiosmtplib.SMTPRecipientRefused(
+            550, "No such user", "missing@example.com")
+
+        with patch("email_validator.aiosmtplib.SMTP", return_value=server):
+            assert await verify_mailbox("missing@example.com", "mx.example.com") is False
+
+    @pytest.mark.asyncio
+    async def test_concurrent_sessions_limited_per_host(self):
+        """Test no more than SMTP_MAX_SESSIONS_PER_HOST sessions run at once."""
+        active = 0
+        peak = 0
+
+        async def slow_rcpt(email):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            return SimpleNamespace(code=250)
+
+        def new_server(**kwargs):
+            server = self._mock_server()
+            server.rcpt = AsyncMock(side_effect=slow_rcpt)
+            return server
+
+        with patch("email_validator.aiosmtplib.SMTP", side_effect=new_server):
+            results = await asyncio.gather(*(
+                verify_mailbox(f"user{i}@example.com", "mx.example.com") for i in range(6)
+            ))
+
+        assert results == [True] * 6
+        assert peak == email_validator.SMTP_MAX_SESSIONS_PER_HOST
+
+    @pytest.mark.asyncio
+    async def test_host_limits_dropped_when_idle(self):
+        """Test per-host semaphores don't outlive the verifications using them."""
+        with patch("email_validator.aiosmtplib.SMTP", side_effect=lambda **kwargs: self._mock_server()):
+            await asyncio.gather(*(
+                verify_mailbox(f"user@example{i}.com", f"mx{i}.example.com") for i in range(5)
+            ))
+
+        assert email_validator._smtp_host_semaphores == {}
+        assert email_validator._smtp_host_users == {}
+
+    @pytest.mark.asyncio
+    async def test_stale_connections_reaped_on_checkout(self):
+        """Test idle connections to other hosts are closed when a connection is checked out."""
+        stale = self._mock_server()
+        email_validator._smtp_pool["old.example.com"] = [
+            (stale, time.monotonic() - email_validator.SMTP_IDLE_TIMEOUT)
+        ]
+
+        with patch("email_validator.aiosmtplib.SMTP", return_value=self._mock_server()):
+            assert await verify_mailbox("a@example.com", "mx.example.com") is True
+
+        stale.close.assert_called_once()
+        assert "old.example.com" not in email_validator._smtp_pool
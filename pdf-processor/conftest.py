@@ -10,25 +10,10 @@ import os
 import warnings
 import pytest
 
-# Set environment variable to suppress warnings at Python startup
-# Note: Only use standard warning categories that Python recognizes
-if 'PYTHONWARNINGS' not in os.environ:
-    os.environ['PYTHONWARNINGS'] = (
-        'ignore:builtin type.*has no.*module.*attribute:DeprecationWarning,'
-        'ignore:Support for class-based.*config.*is deprecated:DeprecationWarning,'
-        'ignore::DeprecationWarning:.*importlib.*,'
-        'ignore::DeprecationWarning:.*pydantic.*'
-    )
-
-# Apply filters immediately at module level
-warnings.filterwarnings("ignore", category=DeprecationWarning, message=r"builtin type .* has no __module__ attribute")
-warnings.filterwarnings("ignore", category=DeprecationWarning, message="Support for class-based.*config.*is deprecated")
-warnings.filterwarnings("ignore", category=DeprecationWarning, module=".*importlib.*")
-warnings.filterwarnings("ignore", category=DeprecationWarning, module=".*pydantic.*")
-
 
 def pytest_configure(config):
     """Configure pytest with our warning management strategy"""
+    _install_startup_filters()
     
     # Import and apply centralized warning management
     try:
@@ -42,6 +27,24 @@ def pytest_configure(config):
     _enable_own_code_warnings()
 
 
+def _install_startup_filters():
+    """Install the filters that must be active before any test module is imported"""
+    # Set environment variable so subprocesses started by tests inherit the filters
+    # Note: Only use standard warning categories that Python recognizes
+    if 'PYTHONWARNINGS' not in os.environ:
+        os.environ['PYTHONWARNINGS'] = (
+            'ignore:builtin type.*has no.*module.*attribute:DeprecationWarning,'
+            'ignore:Support for class-based.*config.*is deprecated:DeprecationWarning,'
+            'ignore::DeprecationWarning:.*importlib.*,'
+            'ignore::DeprecationWarning:.*pydantic.*'
+        )
+    
+    warnings.filterwarnings("ignore", category=DeprecationWarning, message=r"builtin type .* has no __module__ attribute")
+    warnings.filterwarnings("ignore", category=DeprecationWarning, message="Support for class-based.*config.*is deprecated")
+    warnings.filterwarnings("ignore", category=DeprecationWarning, module=".*importlib.*")
+    warnings.filterwarnings("ignore", category=DeprecationWarning, module=".*pydantic.*")
+
+
 def _apply_fallback_filters():
     """Apply fallback warning filters if warning_management module is not available"""
     # Suppress SWIG-related warnings from marker-pdf dependencies
@@ -91,12 +94,6 @@ def pytest_sessionstart(session):
 
 def pytest_sessionfinish(session, exitstatus):
     """Apply warning filters one final time before session ends"""
-    # Reapply filters to catch any late warnings
+    # Reapply filters to catch any late warnings; their module= regexes
+    # already cover pydantic and importlib, and the message filter covers SWIG
     _apply_fallback_filters()
-    
-    # Also suppress any remaining sys warnings
-    import sys
-    if hasattr(sys, 'modules'):
-        for module_name in list(sys.modules.keys()):
-            if any(pattern in module_name for pattern in ['swig', 'pydantic', 'importlib']):
-                warnings.filterwarnings("ignore", category=DeprecationWarning, module=module_name)
\ No newline at end of file
@@ -77,34 +77,14 @@ def apply_warning_filters() -> None:
     warnings.filterwarnings("ignore", category=DeprecationWarning, module=".*importlib.*")
     warnings.filterwarnings("ignore", category=DeprecationWarning, module=".*pydantic.*")
     
-    # Comprehensive SWIG warnings patterns (multiple variations)
-    swig_patterns = [
-        r"builtin type .* has no __module__ attribute",
-        r"builtin type SwigPyPacked has no __module__ attribute",
-        r"builtin type SwigPyObject has no __module__ attribute", 
-        r"builtin type swigvarlink has no __module__ attribute"
-    ]
-    
-    for pattern in swig_patterns:
-        warnings.filterwarnings(
-            "ignore",
-            category=DeprecationWarning,
-            message=pattern
-        )
-    
-    # Also catch any remaining SWIG warnings by broader matching
+    # Any other SWIG warnings whose wording differs from the inventory pattern
+    # (the inventory's "builtin type .*" pattern already covers SwigPyPacked,
+    # SwigPyObject and swigvarlink, and its Pydantic entry the config warning)
     warnings.filterwarnings(
         "ignore", 
         category=DeprecationWarning,
         message=".*Swig.*"
     )
-    
-    # Additional Pydantic patterns
-    warnings.filterwarnings(
-        "ignore",
-        "Support for class-based.*config.*is deprecated",
-        DeprecationWarning
-    )
 
 
 def get_suppression_summary() -> List[str]:
@@ -5,6 +5,7 @@
 #     "aiofiles",
 #     "aiohttp",
 #     "beautifulsoup4",
+#     "lxml",
 #     "PyMuPDF",
 #     "mcp",
 #     "marker-pdf",
@@ -14,11 +15,19 @@
 
 import asyncio
 import json
+import os
 import tempfile
 import logging
+import shutil
+import subprocess
+import importlib.util
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
 from pathlib import Path
-from typing import Optional, Dict, Any, List
-from urllib.parse import urljoin, urlparse, urlunparse, parse_qs
+from typing import Optional, Dict, Any, Iterator, List, Tuple
+from urllib.parse import urljoin, urlparse, urlsplit, urlunparse, parse_qs
 from urllib.request import url2pathname
 import aiohttp
 import aiofiles
@@ -30,19 +39,181 @@ import hashlib
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-try:
-    from marker.converters.pdf import PdfConverter
-    from marker.settings import Settings
-    MARKER_AVAILABLE = True
+# marker-pdf is only ever run through its CLI, so look the package up rather than
+# importing it: its import pulls in torch, which every conversion worker would repeat
+MARKER_AVAILABLE = importlib.util.find_spec("marker") is not None
+if MARKER_AVAILABLE:
     logger.info("marker-pdf available - enhanced PDF processing enabled")
-except ImportError:
-    MARKER_AVAILABLE = False
+else:
     logger.info("marker-pdf not available - using PyMuPDF fallback")
 
 from mcp.server import Server
 from mcp.types import Resource, Tool, TextContent, ImageContent, EmbeddedResource
 import mcp.server.stdio
 
+# Year mentions used to favour recent papers when ranking PDF links
+_YEAR_RE = re.compile(r'(20\d{2})')
+_ARXIV_ID_RE = re.compile(r'(\d{4})\.(\d{4,5})')
+
+# Publisher/repository hosts that indicate an academic paper
+_ACADEMIC_URL_RE = re.compile('|'.join(re.escape(pattern) for pattern in (
+    'arxiv.org',
+    'doi.org',
+    'ieee.org',
+    'acm.org',
+    'nature.com',
+    'science.org',
+    'springer.com',
+    'elsevier.com',
+    'wiley.com',
+    'cambridge.org',
+    'oxford.com',
+    'semanticscholar.org',
+    'researchgate.net',
+)), re.IGNORECASE)
+
+# PDF URL markers for topics unrelated to robotics/self-modeling pages
+_UNRELATED_PDF_RE = re.compile('|'.join(re.escape(indicator) for indicator in (
+    'openai', 'dota', '1912.06680',  # Specific to the bug case
+    'gpt', 'language model', 'nlp',  # Common unrelated topics for robotics papers
+)), re.IGNORECASE)
+
+# Math content summarised at the top of converted documents, as one
+# alternation so each page is scanned once; display math is tried before
+# inline math so $$...$$ isn't also reported as $...$. Only the LaTeX
+# environments can span lines, so DOTALL is scoped to them.
+_MATH_RE = re.compile('|'.join((
+    r'\$\$[^$]+\$\$',  # Display math
+    r'\$[^$]+\$',  # Inline math
+    r'(?s:\\begin\{equation\}.*?\\end\{equation\})',  # LaTeX equations
+    r'(?s:\\begin\{align\}.*?\\end\{align\})',  # LaTeX align
+    r'[∑∫∂∇αβγδεζηθικλμνξπρστυφχψω]',  # Greek letters and math symbols
+)), re.IGNORECASE)
+
+# Paragraph clean-up: whitespace runs, words run together by extraction,
+# and method-related terms emphasised for LLM readers
+_WS_RE = re.compile(r'\s+')
+_CAMEL_RE = re.compile(r'([a-z])([A-Z])')
+_EMPH_RE = re.compile(r'\b(algorithm|method|approach|technique|framework)\b', re.IGNORECASE)
+
+# Words that mark converted output as a research paper, and how many leading
+# characters are searched for them
+_RESEARCH_PAPER_RE = re.compile('abstract|introduction', re.IGNORECASE)
+RESEARCH_PAPER_SCAN_CHARS = 16 * 1024
+
+# Substrings that mark a line as code, matched anywhere in the line
+_CODE_RE = re.compile('|'.join(re.escape(indicator) for indicator in (
+    'def ', 'class ', 'import ', 'from ',  # Python
+    'function ', 'var ', 'const ', 'let ',  # JavaScript
+    'public ', 'private ', 'void ',  # Java/C++
+    '#!/', '<?', '<%',  # Script headers
+    '{', '}',  # Braces
+)), re.IGNORECASE)
+
+# Operators, symbols and keywords that mark a paragraph as math
+_MATH_CHARS = frozenset('=+-*/^∑∫∂∇$\\')
+_MATH_WORDS = ('equation', 'formula', 'theorem', 'frac', 'sqrt')
+
+# PyMuPDF span flags, and the markdown wrapper for each bold/italic
+# combination indexed by (bold << 1) | italic
+_FLAG_ITALIC = 1 << 1
+_FLAG_BOLD = 1 << 4
+_FLAG_STYLED = _FLAG_BOLD | _FLAG_ITALIC
+_STYLERS = (
+    lambda text: text,
+    lambda text: f"*{text}*",
+    lambda text: f"**{text}**",
+    lambda text: f"***{text}***",
+)
+
+# Most PDF downloads a batch conversion runs at once
+MAX_CONCURRENT_DOWNLOADS = 10
+
+# Worker tasks URLCrawler runs to fetch pages while following same-domain links
+MAX_CONCURRENT_CRAWLS = 10
+
+# Bytes read from the network per write when streaming a PDF download to disk
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# Version of the markdown conversion logic; bump it when output changes so
+# markdown cached by older versions is no longer served
+PROCESSOR_VERSION = 2
+
+# Largest PDF download accepted, checked against Content-Length and while streaming
+MAX_DOWNLOAD_SIZE = 200 * 1024 * 1024
+
+# Worker processes a batch conversion spreads PyMuPDF parsing across; kept small
+# since the pool lives as long as the server
+MAX_CONVERSION_WORKERS = min(4, os.cpu_count() or 1)
+
+# Shared HTTP session so downloads and crawls reuse pooled keep-alive connections
+_session: Optional[aiohttp.ClientSession] = None
+_session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+async def get_session() -> aiohttp.ClientSession:
+    """Return the shared HTTP session, creating it on first use in this event loop"""
+    global _session, _session_loop
+    loop = asyncio.get_running_loop()
+    if _session is None or _session.closed or _session_loop is not loop:
+        if _session is not None and not _session.closed:
+            await _close_stale_session(_session)
+        _session = aiohttp.ClientSession(
+            # Resolved hosts are cached for 5 minutes rather than aiohttp's default 10 seconds
+            connector=aiohttp.TCPConnector(limit=100, limit_per_host=10, ttl_dns_cache=300),
+            timeout=aiohttp.ClientTimeout(total=60, connect=10)
+        )
+        _session_loop = loop
+    return _session
+
+
+async def _close_stale_session(session: aiohttp.ClientSession) -> None:
+    """Close a session left over from an event loop that is no longer running"""
+    try:
+        await session.close()
+    except Exception as e:
+        # Its transports belong to the old loop, which may already be closed;
+        # detaching still marks the session closed so it isn't reported as leaked
+        logger.warning(f"Discarding HTTP session from a previous event loop: {e}")
+        session.detach()
+
+
+async def close_session() -> None:
+    """Close the shared HTTP session if one is open"""
+    global _session, _session_loop
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+    _session_loop = None
+
+
+# Worker processes for batch conversions, started on first use and reused so
+# each batch doesn't pay for starting workers and importing this module again
+_conversion_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_conversion_pool() -> ProcessPoolExecutor:
+    """Return the shared conversion process pool, creating it on first use"""
+    global _conversion_pool
+    if _conversion_pool is None:
+        # spawn, not fork: forking a process that runs an event loop and helper
+        # threads can deadlock the child
+        _conversion_pool = ProcessPoolExecutor(
+            max_workers=MAX_CONVERSION_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _conversion_pool
+
+
+def shutdown_conversion_pool() -> None:
+    """Stop the shared conversion process pool if one is running"""
+    global _conversion_pool
+    if _conversion_pool is not None:
+        # Don't block the caller's event loop waiting on in-flight conversions
+        _conversion_pool.shutdown(wait=False, cancel_futures=True)
+    _conversion_pool = None
+
+
 class PDFProcessor:
     """Handles PDF downloading and conversion to markdown"""
     
@@ -90,7 +261,7 @@ class PDFProcessor:
         
         return normalized
     
-    def _get_conversion_cache_key(self, url: str, start_page: Optional[int] = None, end_page: Optional[int] = None, force_method: Optional[str] = None) -> str:
+    def _get_conversion_cache_key(self, url: str, start_page: Optional[int] = None, end_page: Optional[int] = None, force_method: Optional[str] = None, preserve_formatting: bool = True) -> str:
         """Generate cache key for markdown conversion results"""
         normalized_url = self._normalize_url_for_cache(url)
         
@@ -100,12 +271,14 @@ class PDFProcessor:
             'start_page': start_page,
             'end_page': end_page,
             'force_method': force_method,
-            'marker_available': MARKER_AVAILABLE
+            'preserve_formatting': preserve_formatting,
+            'marker_available': MARKER_AVAILABLE,
+            'processor_version': PROCESSOR_VERSION
         }
         
         # Create deterministic hash of parameters
         params_str = json.dumps(params, sort_keys=True)
-        cache_key = hashlib.md5(params_str.encode()).hexdigest()
+        cache_key = hashlib.blake2b(params_str.encode(), digest_size=16).hexdigest()
         return cache_key
     
     def _get_cached_markdown(self, cache_key: str) -> Optional[str]:
@@ -139,6 +312,28 @@ class PDFProcessor:
         except Exception as e:
             logger.warning(f"Failed to cache markdown {cache_file}: {e}")
 
+    def _get_cached_pdf(self, cache_file: Path) -> Optional[Path]:
+        """Return cache_file if it holds a cached PDF, discarding it if empty"""
+        try:
+            size = cache_file.stat().st_size
+        except FileNotFoundError:
+            return None
+
+        if size == 0:
+            # Left by older versions that wrote straight to the cache file
+            logger.warning(f"Discarding empty cached PDF: {cache_file}")
+            cache_file.unlink(missing_ok=True)
+            return None
+
+        logger.info(f"Using cached PDF: {cache_file}")
+        return cache_file
+
+    def _new_part_file(self, cache_file: Path) -> Path:
+        """Create a uniquely named partial file beside cache_file to write into"""
+        fd, part_path = tempfile.mkstemp(dir=cache_file.parent, prefix=f"{cache_file.stem}.", suffix=".part")
+        os.close(fd)
+        return Path(part_path)
+
     async def _handle_file_url(self, url: str, cache_file: Path) -> Optional[Path]:
         """Handle file:// URLs by reading from local filesystem."""
         try:
@@ -164,8 +359,14 @@ class PDFProcessor:
                 return None
 
             # Copy to cache for consistency with HTTP downloads
-            async with aiofiles.open(cache_file, 'wb') as f:
-                await f.write(content)
+            part_file = self._new_part_file(cache_file)
+            try:
+                async with aiofiles.open(part_file, 'wb') as f:
+                    await f.write(content)
+                os.replace(part_file, cache_file)
+            except BaseException:
+                part_file.unlink(missing_ok=True)
+                raise
 
             logger.info(f"Successfully copied local PDF: {local_path} -> {cache_file} ({len(content)} bytes)")
             return cache_file
@@ -180,12 +381,12 @@ class PDFProcessor:
     async def download_pdf(self, url: str) -> Optional[Path]:
         """Download PDF from URL and cache it. Supports http://, https://, and file:// URLs."""
         normalized_url = self._normalize_url_for_cache(url)
-        url_hash = hashlib.md5(normalized_url.encode()).hexdigest()
+        url_hash = hashlib.blake2b(normalized_url.encode(), digest_size=16).hexdigest()
         cache_file = self.cache_dir / f"{url_hash}.pdf"
 
-        if cache_file.exists():
-            logger.info(f"Using cached PDF: {cache_file}")
-            return cache_file
+        cached_pdf = self._get_cached_pdf(cache_file)
+        if cached_pdf:
+            return cached_pdf
 
         # Handle file:// URLs - read directly from filesystem
         if url.lower().startswith('file://'):
@@ -202,40 +403,60 @@ class PDFProcessor:
             'Upgrade-Insecure-Requests': '1',
         }
         
+        part_file = None
+        downloaded = False
         try:
+            session = await get_session()
             timeout = aiohttp.ClientTimeout(total=30, connect=10)
-            connector = aiohttp.TCPConnector(limit=10, limit_per_host=5)
-            
-            async with aiohttp.ClientSession(
-                timeout=timeout, 
-                connector=connector,
-                headers=headers
-            ) as session:
+
+            async with session.get(url, headers=headers, timeout=timeout,
+                                   allow_redirects=True, max_redirects=5) as response:
+                logger.info(f"Response status: {response.status} for {url}")
+                logger.info(f"Content-Type: {response.headers.get('content-type', 'unknown')}")
                 
-                async with session.get(url, allow_redirects=True, max_redirects=5) as response:
-                    logger.info(f"Response status: {response.status} for {url}")
-                    logger.info(f"Content-Type: {response.headers.get('content-type', 'unknown')}")
-                    
-                    if response.status != 200:
-                        logger.error(f"HTTP {response.status} for {url}")
-                        return None
-                    
-                    content_type = response.headers.get('content-type', '').lower()
-                    if not any(pdf_type in content_type for pdf_type in ['application/pdf', 'application/octet-stream']):
-                        if not (url.lower().endswith('.pdf') or content_type == ''):
-                            logger.warning(f"Unexpected content-type: {content_type} for {url}")
-                    
-                    content = await response.read()
-                    
-                    if not content.startswith(b'%PDF-'):
-                        logger.error(f"Downloaded content is not a valid PDF from {url}")
-                        return None
-                    
-                    async with aiofiles.open(cache_file, 'wb') as f:
-                        await f.write(content)
-                    
-                    logger.info(f"Successfully downloaded PDF: {url} -> {cache_file} ({len(content)} bytes)")
-                    return cache_file
+                if response.status != 200:
+                    logger.error(f"HTTP {response.status} for {url}")
+                    return None
+                
+                content_type = response.headers.get('content-type', '').lower()
+                if not any(pdf_type in content_type for pdf_type in ['application/pdf', 'application/octet-stream']):
+                    if not (url.lower().endswith('.pdf') or content_type == ''):
+                        logger.warning(f"Unexpected content-type: {content_type} for {url}")
+                
+                if response.content_length is not None and response.content_length > MAX_DOWNLOAD_SIZE:
+                    logger.error(f"PDF at {url} is too large ({response.content_length} bytes, limit {MAX_DOWNLOAD_SIZE})")
+                    return None
+                
+                # Stream to a private partial file so large PDFs are never held in
+                # memory whole, and the cache only ever sees complete downloads
+                part_file = self._new_part_file(cache_file)
+                size = 0
+                # The first chunk can be shorter than the magic bytes, so they are
+                # collected across chunks before the body is checked
+                magic = b'%PDF-'
+                head = b''
+                async with aiofiles.open(part_file, 'wb') as f:
+                    async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                        if len(head) < len(magic):
+                            head += chunk[:len(magic) - len(head)]
+                            if not magic.startswith(head):
+                                logger.error(f"Downloaded content is not a valid PDF from {url}")
+                                return None
+                        size += len(chunk)
+                        # Content-Length can be missing, or describe a compressed body
+                        if size > MAX_DOWNLOAD_SIZE:
+                            logger.error(f"PDF at {url} exceeds the {MAX_DOWNLOAD_SIZE} byte download limit")
+                            return None
+                        await f.write(chunk)
+                
+                if head != magic:
+                    logger.error(f"Downloaded content is not a valid PDF from {url}")
+                    return None
+                
+                os.replace(part_file, cache_file)
+                downloaded = True
+                logger.info(f"Successfully downloaded PDF: {url} -> {cache_file} ({size} bytes)")
+                return cache_file
                     
         except aiohttp.ClientError as e:
             logger.error(f"Network error downloading PDF from {url}: {e}")
@@ -246,95 +467,82 @@ class PDFProcessor:
         except Exception as e:
             logger.error(f"Unexpected error downloading PDF from {url}: {e}")
             return None
+        finally:
+            # Clean up the partial file of a failed or rejected download
+            if not downloaded and part_file is not None:
+                part_file.unlink(missing_ok=True)
     
     def extract_pdf_metadata(self, pdf_path: Path) -> Dict[str, Any]:
         """Extract metadata from PDF"""
         try:
-            doc = fitz.open(str(pdf_path))
-            metadata = doc.metadata
-            return {
-                'title': metadata.get('title', '').strip(),
-                'author': metadata.get('author', '').strip(),
-                'subject': metadata.get('subject', '').strip(),
-                'creator': metadata.get('creator', '').strip(),
-                'pages': doc.page_count,
-                'format': metadata.get('format', '').strip()
-            }
+            # Only the trailer, info dictionary and page-tree root are read here;
+            # closing straight away releases the file handle and xref tables
+            with fitz.open(str(pdf_path)) as doc:
+                return self._read_metadata(doc)
         except Exception as e:
             logger.error(f"Failed to extract metadata from {pdf_path}: {e}")
             return {}
     
+    def _read_metadata(self, doc) -> Dict[str, Any]:
+        """Read metadata from an already open PDF document"""
+        # Encrypted documents report no metadata until they are authenticated
+        metadata = doc.metadata or {}
+        return {
+            'title': metadata.get('title', '').strip(),
+            'author': metadata.get('author', '').strip(),
+            'subject': metadata.get('subject', '').strip(),
+            'creator': metadata.get('creator', '').strip(),
+            'pages': doc.page_count,
+            'format': metadata.get('format', '').strip()
+        }
+    
     def is_academic_paper(self, pdf_path: Path, url: str = "") -> bool:
         """Detect if a PDF is likely an academic paper"""
         academic_indicators = []
         
         # Check URL patterns
-        if url:
-            academic_url_patterns = [
-                'arxiv.org',
-                'doi.org', 
-                'ieee.org',
-                'acm.org',
-                'nature.com',
-                'science.org',
-                'springer.com',
-                'elsevier.com',
-                'wiley.com',
-                'cambridge.org',
-                'oxford.com',
-                'semanticscholar.org',
-                'researchgate.net'
-            ]
-            if any(pattern in url.lower() for pattern in academic_url_patterns):
-                academic_indicators.append("academic_url")
+        if url and _ACADEMIC_URL_RE.search(url):
+            academic_indicators.append("academic_url")
         
-        # Check PDF metadata
+        # Metadata and content sampling share one open document
         try:
-            metadata = self.extract_pdf_metadata(pdf_path)
-            
-            # Check for academic keywords in title/subject
-            academic_keywords = [
-                'arxiv', 'doi', 'abstract', 'conference', 'proceedings', 
-                'journal', 'volume', 'issue', 'research', 'university',
-                'ieee', 'acm', 'springer', 'elsevier', 'nature'
-            ]
-            
-            title_subject = f"{metadata.get('title', '')} {metadata.get('subject', '')}".lower()
-            if any(keyword in title_subject for keyword in academic_keywords):
-                academic_indicators.append("academic_metadata")
+            with fitz.open(str(pdf_path)) as doc:
+                # Check PDF metadata
+                metadata = self._read_metadata(doc)
                 
-            # Check creator patterns
-            creator = metadata.get('creator', '').lower()
-            if any(pattern in creator for pattern in ['latex', 'pdflatex', 'xelatex']):
-                academic_indicators.append("latex_created")
+                # Check for academic keywords in title/subject
+                academic_keywords = [
+                    'arxiv', 'doi', 'abstract', 'conference', 'proceedings', 
+                    'journal', 'volume', 'issue', 'research', 'university',
+                    'ieee', 'acm', 'springer', 'elsevier', 'nature'
+                ]
                 
-        except Exception as e:
-            logger.debug(f"Could not extract metadata for academic detection: {e}")
-        
-        # Quick content sampling for academic patterns
-        try:
-            import fitz
-            doc = fitz.open(str(pdf_path))
-            
-            # Check first few pages for academic patterns
-            academic_content_patterns = [
-                'abstract', 'introduction', 'methodology', 'references',
-                'bibliography', 'citation', 'arxiv:', 'doi:', 'et al.',
-                'university', 'department', 'conference', 'proceedings'
-            ]
-            
-            sample_text = ""
-            for page_num in range(min(3, doc.page_count)):  # First 3 pages
-                sample_text += doc[page_num].get_text().lower()
-            
-            matches = sum(1 for pattern in academic_content_patterns if pattern in sample_text)
-            if matches >= 3:  # If 3+ academic patterns found
-                academic_indicators.append("academic_content")
+                title_subject = f"{metadata.get('title', '')} {metadata.get('subject', '')}".lower()
+                if any(keyword in title_subject for keyword in academic_keywords):
+                    academic_indicators.append("academic_metadata")
+                    
+                # Check creator patterns
+                creator = metadata.get('creator', '').lower()
+                if any(pattern in creator for pattern in ['latex', 'pdflatex', 'xelatex']):
+                    academic_indicators.append("latex_created")
+                
+                # Quick content sampling for academic patterns
+                academic_content_patterns = [
+                    'abstract', 'introduction', 'methodology', 'references',
+                    'bibliography', 'citation', 'arxiv:', 'doi:', 'et al.',
+                    'university', 'department', 'conference', 'proceedings'
+                ]
+                
+                sample_text = ""
+                for page_num in range(min(3, doc.page_count)):  # First 3 pages
+                    sample_text += doc[page_num].get_text().lower()
+                
+                matches = sum(1 for pattern in academic_content_patterns if pattern in sample_text)
+                if matches >= 3:  # If 3+ academic patterns found
+                    academic_indicators.append("academic_content")
                 
-            doc.close()
-            
         except Exception as e:
-            logger.debug(f"Could not sample content for academic detection: {e}")
+            logger.debug(f"Could not inspect PDF for academic detection: {e}")
         
         # Determine if academic (need at least 2 indicators or strong single indicator)
         is_academic = (
@@ -359,10 +567,6 @@ class PDFProcessor:
             logger.info(f"Converting PDF with marker-pdf: {pdf_path}")
             
             # Create temporary directories for marker processing
-            import tempfile
-            import subprocess
-            import shutil
-            
             with tempfile.TemporaryDirectory() as temp_dir:
                 temp_path = Path(temp_dir)
                 input_dir = temp_path / "input"
@@ -441,11 +645,11 @@ class PDFProcessor:
             logger.info("Falling back to PyMuPDF conversion")
             return self._convert_pdf_to_markdown_pymupdf(pdf_path)
     
-    def convert_pdf_to_markdown(self, pdf_path: Path, start_page: int = None, end_page: int = None, source_url: str = "", force_method: str = None) -> str:
+    def convert_pdf_to_markdown(self, pdf_path: Path, start_page: int = None, end_page: int = None, source_url: str = "", force_method: str = None, preserve_formatting: bool = True) -> str:
         """Convert PDF to markdown with automatic method selection and caching"""
         # Check cache first
         if source_url:
-            cache_key = self._get_conversion_cache_key(source_url, start_page, end_page, force_method)
+            cache_key = self._get_conversion_cache_key(source_url, start_page, end_page, force_method, preserve_formatting)
             cached_result = self._get_cached_markdown(cache_key)
             if cached_result:
                 return cached_result
@@ -474,7 +678,7 @@ class PDFProcessor:
                 logger.warning(f"marker-pdf failed, falling back to PyMuPDF: {e}")
         
         if markdown_result is None:
-            markdown_result = self._convert_pdf_to_markdown_pymupdf(pdf_path, start_page, end_page)
+            markdown_result = self._convert_pdf_to_markdown_pymupdf(pdf_path, start_page, end_page, preserve_formatting)
         
         # Cache the result if we have a source URL
         if source_url and markdown_result:
@@ -482,11 +686,17 @@ class PDFProcessor:
         
         return markdown_result
     
-    def _convert_pdf_to_markdown_pymupdf(self, pdf_path: Path, start_page: int = None, end_page: int = None) -> str:
-        """Convert PDF to markdown using PyMuPDF"""
+    def _convert_pdf_to_markdown_pymupdf(self, pdf_path: Path, start_page: int = None, end_page: int = None, preserve_formatting: bool = True) -> str:
+        """Convert PDF to markdown using PyMuPDF
+        
+        With preserve_formatting off, pages are read with the much cheaper
+        get_text("blocks"), which drops font-size headings and bold/italic styling.
+        """
         try:
             doc = fitz.open(str(pdf_path))
             markdown_content = []
+            # (level, title) of every heading emitted, in document order, for the TOC
+            headings: List[Tuple[int, str]] = []
             
             # Determine page range
             total_pages = doc.page_count
@@ -498,11 +708,11 @@ class PDFProcessor:
             end_page = max(start_page, min(end_page, total_pages))
             
             # Add metadata header optimized for Claude Code
-            metadata = self.extract_pdf_metadata(pdf_path)
+            metadata = self._read_metadata(doc)
             if metadata:
-                markdown_content.append("# 📄 Document Analysis")
-                markdown_content.append("")
+                self._add_heading(markdown_content, headings, 1, "📄 Document Analysis")
                 markdown_content.append("## Document Metadata")
+                headings.append((2, "Document Metadata"))
                 for key, value in metadata.items():
                     if value:
                         markdown_content.append(f"- **{key.title()}**: {value}")
@@ -511,155 +721,127 @@ class PDFProcessor:
                 if start_page > 1 or end_page < total_pages:
                     markdown_content.append(f"- **Page Range**: {start_page}-{end_page} of {total_pages}")
                 
-                markdown_content.append("")
                 
                 # Add LLM optimization hints
-                markdown_content.append("## 🤖 Processing Notes")
-                markdown_content.append("- This document has been optimized for large language model analysis")
-                markdown_content.append("- Mathematical formulas are preserved in LaTeX format")
-                markdown_content.append("- Code blocks and algorithms are clearly marked")
-                markdown_content.append("- Tables and figures are structurally annotated")
+                markdown_content.append(
+                    "\n## 🤖 Processing Notes\n"
+                    "- This document has been optimized for large language model analysis\n"
+                    "- Mathematical formulas are preserved in LaTeX format\n"
+                    "- Code blocks and algorithms are clearly marked\n"
+                    "- Tables and figures are structurally annotated"
+                )
+                headings.append((2, "🤖 Processing Notes"))
                 if start_page > 1 or end_page < total_pages:
                     markdown_content.append(f"- **Partial Conversion**: Only pages {start_page}-{end_page} shown")
-                markdown_content.append("")
-                markdown_content.append("---")
-                markdown_content.append("")
-            
-            # Extract and process mathematical content (from selected pages only)
-            math_expressions = self._extract_math_expressions_from_range(doc, start_page - 1, end_page - 1)
-            if math_expressions:
-                markdown_content.append("## 🔢 Mathematical Content Summary")
-                for i, expr in enumerate(math_expressions[:5], 1):  # Show first 5
-                    markdown_content.append(f"{i}. `{expr}`")
-                markdown_content.append("")
-                markdown_content.append("---")
-                markdown_content.append("")
+                markdown_content.append("\n---\n")
             
-            # Process selected pages with enhanced structure detection
-            for page_num in range(start_page - 1, end_page):
-                page = doc[page_num]
-                
-                # Add page header for multi-page documents
-                if total_pages > 1:
-                    markdown_content.append(f"## 📑 Page {page_num + 1}")
-                    markdown_content.append("")
+            # Process selected pages with enhanced structure detection. Each
+            # page's text dict is extracted once and also feeds the math summary.
+            math_expressions: Dict[str, None] = {}  # Insertion-ordered set, first-seen order
+            page_content = []
+            page_headings: List[Tuple[int, str]] = []
+            text_option = "dict" if preserve_formatting else "blocks"
+            multi_page = total_pages > 1  # Page headers only for multi-page documents
+            for page_num, page_text in self._iter_page_text(doc, start_page, end_page, text_option):
+                if preserve_formatting:
+                    plaintext = self._dict_to_plaintext(page_text)
+                    sections = self._organize_content_by_structure(page_text)
+                else:
+                    plaintext = "\n".join(block[4] for block in page_text if block[6] == 0)
+                    sections = self._organize_text_blocks(page_text)
+                for expr in self._scan_math_expressions(plaintext):
+                    math_expressions.setdefault(expr)
                 
-                # Extract text with enhanced structure preservation
-                text_dict = page.get_text("dict")
-                sections = self._organize_content_by_structure(text_dict)
+                if multi_page:
+                    self._add_heading(page_content, page_headings, 2, f"📑 Page {page_num + 1}")
                 
                 for section in sections:
                     if section['type'] == 'heading':
                         level = min(section.get('level', 3), 6)
-                        markdown_content.append(f"{'#' * level} {section['text']}")
-                        markdown_content.append("")
+                        self._add_heading(page_content, page_headings, level, section['text'])
                     elif section['type'] == 'paragraph':
                         # Clean and format paragraph text
                         cleaned_text = self._clean_paragraph_text(section['text'])
                         if cleaned_text:
-                            markdown_content.append(cleaned_text)
-                            markdown_content.append("")
+                            page_content.append(f"{cleaned_text}\n")
                     elif section['type'] == 'code':
                         # Format code blocks
-                        markdown_content.append("```")
-                        markdown_content.append(section['text'])
-                        markdown_content.append("```")
-                        markdown_content.append("")
+                        page_content.append(f"```\n{section['text']}\n```\n")
                     elif section['type'] == 'table':
                         # Format tables for LLM
-                        markdown_content.append(self._format_table_for_llm(section['data']))
-                        markdown_content.append("")
+                        page_content.append(f"{self._format_table_for_llm(section['data'])}\n")
                     elif section['type'] == 'math':
                         # Format mathematical expressions
-                        markdown_content.append(f"$$")
-                        markdown_content.append(section['text'])
-                        markdown_content.append(f"$$")
-                        markdown_content.append("")
+                        page_content.append(f"$$\n{section['text']}\n$$\n")
                     elif section['type'] == 'figure':
-                        markdown_content.append(f"**Figure {section.get('number', 'N/A')}**: {section.get('caption', 'No caption')}")
-                        markdown_content.append(f"*Dimensions: {section.get('width', 'unknown')}x{section.get('height', 'unknown')} pixels*")
-                        markdown_content.append("")
+                        page_content.append(
+                            f"**Figure {section.get('number', 'N/A')}**: {section.get('caption', 'No caption')}\n"
+                            f"*Dimensions: {section.get('width', 'unknown')}x{section.get('height', 'unknown')} pixels*\n"
+                        )
+            
+            # Mathematical content summary goes ahead of the page content
+            if math_expressions:
+                markdown_content.append("## 🔢 Mathematical Content Summary")
+                headings.append((2, "🔢 Mathematical Content Summary"))
+                for i, expr in enumerate(islice(math_expressions, 5), 1):  # Show first 5
+                    markdown_content.append(f"{i}. `{expr}`")
+                markdown_content.append("\n---\n")
+            
+            markdown_content.extend(page_content)
+            headings.extend(page_headings)
             
             doc.close()
             
             # Final LLM optimization
-            final_content = self._apply_llm_optimizations("\n".join(markdown_content))
+            final_content = self._apply_llm_optimizations("\n".join(markdown_content), headings)
             return final_content
             
         except Exception as e:
             logger.error(f"Failed to convert PDF {pdf_path}: {e}")
             return f"Error converting PDF: {str(e)}"
     
-    def _process_text_block(self, block: Dict) -> str:
-        """Process a text block with formatting preservation"""
-        lines = []
-        
-        for line in block["lines"]:
-            line_text = ""
-            prev_font_size = None
-            
-            for span in line["spans"]:
-                text = span["text"].strip()
-                if not text:
-                    continue
-                    
-                font_size = span.get("size", 12)
-                flags = span.get("flags", 0)
-                
-                # Apply formatting
-                if flags & 2**4:  # Bold
-                    text = f"**{text}**"
-                if flags & 2**1:  # Italic
-                    text = f"*{text}*"
-                
-                # Detect headings by font size changes
-                if prev_font_size and font_size > prev_font_size * 1.2:
-                    # Likely a heading
-                    if not text.startswith('#'):
-                        text = f"### {text}"
-                
-                line_text += text + " "
-                prev_font_size = font_size
-            
-            if line_text.strip():
-                lines.append(line_text.strip())
-        
-        return "\n".join(lines)
+    @staticmethod
+    def _iter_page_text(doc, start_page: int, end_page: int, option: str) -> Iterator[Tuple[int, Any]]:
+        """Yield (page index, get_text(option) output) for each page in the range"""
+        for page_num in range(start_page - 1, end_page):
+            page = doc[page_num]
+            if option == "blocks":
+                # "blocks" leaves image blocks out unless asked; "dict" includes them by default
+                page_text = page.get_text(option, flags=fitz.TEXTFLAGS_BLOCKS | fitz.TEXT_PRESERVE_IMAGES)
+            else:
+                page_text = page.get_text(option)
+            # Drop the page before the next one loads so MuPDF can free its buffers
+            del page
+            yield page_num, page_text
     
-    def _extract_math_expressions(self, doc) -> List[str]:
-        """Extract mathematical expressions from PDF"""
-        return self._extract_math_expressions_from_range(doc, 0, doc.page_count - 1)
+    @staticmethod
+    def _add_heading(lines: List[str], headings: List[Tuple[int, str]], level: int, title: str) -> None:
+        """Append a markdown heading and a blank line, recording it for the TOC"""
+        lines.append(f"{'#' * level} {title}")
+        lines.append("")
+        headings.append((level, title))
     
-    def _extract_math_expressions_from_range(self, doc, start_page: int, end_page: int) -> List[str]:
-        """Extract mathematical expressions from specific page range"""
-        math_patterns = [
-            r'\$[^$]+\$',  # Inline math
-            r'\$\$[^$]+\$\$',  # Display math
-            r'\\begin\{equation\}.*?\\end\{equation\}',  # LaTeX equations
-            r'\\begin\{align\}.*?\\end\{align\}',  # LaTeX align
-            r'[∑∫∂∇αβγδεζηθικλμνξπρστυφχψω]',  # Greek letters and math symbols
-        ]
-        
-        expressions = []
-        for page_num in range(start_page, end_page + 1):
-            if page_num < doc.page_count:
-                page = doc[page_num]
-                text = page.get_text()
-                for pattern in math_patterns:
-                    matches = re.findall(pattern, text, re.DOTALL | re.IGNORECASE)
-                    expressions.extend(matches)
-        
-        return list(set(expressions))  # Remove duplicates
+    def _scan_math_expressions(self, text: str) -> List[str]:
+        """Find mathematical expressions in a page's plain text"""
+        return _MATH_RE.findall(text)
+    
+    def _dict_to_plaintext(self, text_dict: Dict) -> str:
+        """Rebuild a page's plain text from its get_text("dict") output"""
+        return "\n".join(
+            "".join(span.get("text", "") for span in line.get("spans", []))
+            for block in text_dict.get("blocks", [])
+            for line in block.get("lines", [])
+        )
     
     def _organize_content_by_structure(self, text_dict: Dict) -> List[Dict]:
         """Organize content by structural elements for LLM consumption"""
         sections = []
         
         for block in text_dict["blocks"]:
-            if "lines" in block:  # Text block
+            block_type = block["type"]
+            if block_type == 0:  # Text block
                 # Analyze font sizes to determine structure
-                avg_font_size = self._get_average_font_size(block)
-                text_content = self._extract_block_text(block)
+                text_content, avg_font_size = self._summarize_block(block)
                 
                 if not text_content.strip():
                     continue
@@ -688,7 +870,7 @@ class PDFProcessor:
                         'text': text_content
                     })
             
-            elif "image" in block:  # Image block
+            elif block_type == 1:  # Image block
                 sections.append({
                     'type': 'figure',
                     'width': block.get('width', 'unknown'),
@@ -698,84 +880,91 @@ class PDFProcessor:
         
         return sections
     
-    def _get_average_font_size(self, block: Dict) -> float:
-        """Get average font size for a text block"""
-        total_size = 0
-        char_count = 0
+    def _organize_text_blocks(self, blocks: List[tuple]) -> List[Dict]:
+        """Organize get_text("blocks") output into sections in reading order"""
+        sections = []
+        figure_count = 0
         
-        for line in block.get("lines", []):
-            for span in line.get("spans", []):
-                size = span.get("size", 12)
-                text_len = len(span.get("text", ""))
-                total_size += size * text_len
-                char_count += text_len
+        # Sort top-to-bottom, then left-to-right, as PyMuPDF's own sort option does
+        for x0, y0, x1, y1, text, _, block_type in sorted(blocks, key=lambda b: (b[3], b[0])):
+            if block_type == 1:  # Image block
+                figure_count += 1
+                sections.append({
+                    'type': 'figure',
+                    'width': round(x1 - x0),
+                    'height': round(y1 - y0),
+                    'number': figure_count
+                })
+                continue
+            
+            text = text.strip()
+            if not text:
+                continue
+            
+            if self._is_code_block(text):
+                sections.append({'type': 'code', 'text': text})
+            elif self._contains_math(text):
+                sections.append({'type': 'math', 'text': text})
+            else:
+                sections.append({'type': 'paragraph', 'text': text})
         
-        return total_size / char_count if char_count > 0 else 12
+        return sections
     
-    def _extract_block_text(self, block: Dict) -> str:
-        """Extract clean text from a block"""
+    def _summarize_block(self, block: Dict) -> Tuple[str, float]:
+        """Extract clean text and the average font size from a block in one pass"""
         lines = []
+        total_size = 0
+        char_count = 0
+        
         for line in block.get("lines", []):
-            line_text = ""
+            line_parts = []
             for span in line.get("spans", []):
-                text = span.get("text", "").strip()
+                raw_text = span.get("text", "")
+                text_len = len(raw_text)
+                total_size += span.get("size", 12) * text_len
+                char_count += text_len
+                
+                text = raw_text.strip()
                 flags = span.get("flags", 0)
                 
-                # Apply formatting
-                if flags & 2**4:  # Bold
-                    text = f"**{text}**"
-                if flags & 2**1:  # Italic
-                    text = f"*{text}*"
+                # Apply bold/italic formatting; plain spans, the common case, skip the wrapper
+                if flags & _FLAG_STYLED:
+                    text = _STYLERS[((flags & _FLAG_BOLD) >> 3) | ((flags & _FLAG_ITALIC) >> 1)](text)
                 
-                line_text += text + " "
+                line_parts.append(text)
             
-            if line_text.strip():
-                lines.append(line_text.strip())
+            line_text = " ".join(line_parts).strip()
+            if line_text:
+                lines.append(line_text)
         
-        return "\n".join(lines)
+        avg_font_size = total_size / char_count if char_count > 0 else 12
+        return "\n".join(lines), avg_font_size
     
     def _is_code_block(self, text: str) -> bool:
         """Detect if text is likely a code block"""
-        code_indicators = [
-            'def ', 'class ', 'import ', 'from ',  # Python
-            'function ', 'var ', 'const ', 'let ',  # JavaScript
-            'public ', 'private ', 'void ',  # Java/C++
-            '#!/', '<?', '<%',  # Script headers
-            '{', '}',  # Braces
-        ]
-        
         lines = text.split('\n')
-        code_line_count = 0
-        
-        for line in lines:
-            if any(indicator in line.lower() for indicator in code_indicators):
-                code_line_count += 1
+        code_line_count = sum(1 for line in lines if _CODE_RE.search(line))
         
         return code_line_count / len(lines) > 0.3 if lines else False
     
     def _contains_math(self, text: str) -> bool:
         """Check if text contains mathematical expressions"""
-        math_indicators = [
-            '=', '+', '-', '*', '/', '^',  # Basic operators
-            '∑', '∫', '∂', '∇',  # Math symbols
-            'equation', 'formula', 'theorem',  # Math keywords
-            '$', '\\', 'frac', 'sqrt',  # LaTeX
-        ]
-        
-        return any(indicator in text for indicator in math_indicators)
+        if not _MATH_CHARS.isdisjoint(text):
+            return True
+        return any(word in text for word in _MATH_WORDS)
     
     def _clean_paragraph_text(self, text: str) -> str:
         """Clean and format paragraph text for LLM consumption"""
         # Remove excessive whitespace
-        text = re.sub(r'\s+', ' ', text)
+        text = _WS_RE.sub(' ', text)
         
         # Fix common PDF extraction issues
         text = text.replace('ﬁ', 'fi').replace('ﬂ', 'fl')  # Ligatures
-        text = re.sub(r'([a-z])([A-Z])', r'\1 \2', text)  # Missing spaces
+        text = _CAMEL_RE.sub(r'\1 \2', text)  # Missing spaces
         
         # Enhance for Claude Code readability
         # Add emphasis to important terms
-        text = re.sub(r'\b(algorithm|method|approach|technique|framework)\b', r'**\1**', text, flags=re.IGNORECASE)
+        text = _EMPH_RE.sub(r'**\1**', text)
         
         return text.strip()
     
@@ -837,35 +1026,37 @@ class PDFProcessor:
         # In a full implementation, this would parse actual table data
         return "| Column 1 | Column 2 | Column 3 |\n|----------|----------|----------|\n| Data     | Data     | Data     |"
     
-    def _apply_llm_optimizations(self, content: str) -> str:
+    def _apply_llm_optimizations(self, content: str, headings: List[Tuple[int, str]]) -> str:
         """Apply final optimizations for LLM consumption"""
         # Add section navigation for long documents
-        lines = content.split('\n')
-        if len(lines) > 100:  # Long document
-            toc = self._generate_table_of_contents(lines)
+        if content.count('\n') >= 100:  # Long document (more than 100 lines)
+            toc = self._generate_table_of_contents(headings)
             content = toc + "\n\n" + content
         
-        # Add research paper specific optimizations
-        if 'abstract' in content.lower() or 'introduction' in content.lower():
-            content = "# 🎓 Research Paper Analysis\n\n" + content
-            content += "\n\n---\n\n## 🤖 Analysis Tips\n"
-            content += "- Use Ctrl+F to quickly find specific algorithms or methods\n"
-            content += "- Mathematical formulas are in LaTeX format for easy copying\n"
-            content += "- Code blocks are clearly marked for implementation reference\n"
-            content += "- Tables and figures are structurally annotated\n"
+        # Add research paper specific optimizations; the markers are looked for
+        # only in the head of the document, where the TOC and abstract sit
+        if _RESEARCH_PAPER_RE.search(content, 0, RESEARCH_PAPER_SCAN_CHARS):
+            content = "".join((
+                "# 🎓 Research Paper Analysis\n\n",
+                content,
+                "\n\n---\n\n## 🤖 Analysis Tips\n"
+                "- Use Ctrl+F to quickly find specific algorithms or methods\n"
+                "- Mathematical formulas are in LaTeX format for easy copying\n"
+                "- Code blocks are clearly marked for implementation reference\n"
+                "- Tables and figures are structurally annotated\n",
+            ))
         
         return content
     
-    def _generate_table_of_contents(self, lines: List[str]) -> str:
+    def _generate_table_of_contents(self, headings: List[Tuple[int, str]]) -> str:
         """Generate table of contents for long documents"""
         toc = ["# 📚 Table of Contents\n"]
         
-        for line in lines:
-            if line.startswith('#'):
-                level = len(line) - len(line.lstrip('#'))
-                title = line.lstrip('# ').strip()
-                indent = "  " * (level - 1)
-                toc.append(f"{indent}- {title}")
+        for level, title in headings:
+            # Multi-line heading blocks render with only their first line as the heading
+            title = title.partition('\n')[0].strip()
+            indent = "  " * (level - 1)
+            toc.append(f"{indent}- {title}")
         
         return "\n".join(toc)
 
@@ -875,65 +1066,85 @@ class URLCrawler:
     async def find_pdf_links(self, url: str, max_depth: int = 1) -> List[str]:
         """Find PDF links from a given URL, prioritized by relevance"""
         pdf_links_with_context = []
-        visited = set()
+        visited = {url}  # Pages already fetched or queued
         page_content = ""  # Store page content for topic extraction
         expected_authors = set()  # Store expected authors from the page
         
+        # Breadth-first crawl: a fixed pool of workers takes (url, depth) pairs
+        # from the queue and queues same-domain links one level deeper
+        queue: asyncio.Queue = asyncio.Queue()
+        queue.put_nowait((url, 0))
+        
+        session = await get_session()
+        
         async def crawl_page(current_url: str, depth: int):
             nonlocal page_content
-            if depth > max_depth or current_url in visited:
-                return
-                
-            visited.add(current_url)
-            
             try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(current_url) as response:
-                        if response.status == 200:
-                            content_type = response.headers.get('content-type', '').lower()
+                # Only HTML bodies are read; for anything else the response is
+                # closed after its headers, so PDFs are never downloaded here
+                async with session.get(current_url) as response:
+                    if response.status == 200:
+                        content_type = response.headers.get('content-type', '').lower()
+                        
+                        # Direct PDF link
+                        if 'application/pdf' in content_type:
+                            pdf_links_with_context.append((current_url, "direct_link", ""))
+                            return
+                        
+                        # HTML page - parse for PDF links
+                        if 'text/html' in content_type:
+                            html = await response.text()
+                            soup = BeautifulSoup(html, 'lxml')
                             
-                            # Direct PDF link
-                            if 'application/pdf' in content_type:
-                                pdf_links_with_context.append((current_url, "direct_link", ""))
-                                return
+                            # Extract page content for topic analysis (only from main page)
+                            if depth == 0:
+                                page_content = self._extract_page_content(soup)
+                                expected_authors = self._extract_expected_authors(soup, current_url)
                             
-                            # HTML page - parse for PDF links
-                            if 'text/html' in content_type:
-                                html = await response.text()
-                                soup = BeautifulSoup(html, 'html.parser')
+                            # Find PDF links with context
+                            current_netloc = urlsplit(current_url).netloc
+                            for link in soup.find_all('a', href=True):
+                                href = link['href']
+                                full_url = urljoin(current_url, href)
                                 
-                                # Extract page content for topic analysis (only from main page)
-                                if depth == 0:
-                                    page_content = self._extract_page_content(soup)
-                                    expected_authors = self._extract_expected_authors(soup, current_url)
+                                # Direct PDF links
+                                if href.lower().endswith('.pdf'):
+                                    # Get link text and surrounding context for relevance scoring
+                                    link_text = self._extract_link_text(link)
+                                    link_context = self._get_link_context(link, soup)
+                                    pdf_links_with_context.append((full_url, link_text, link_context))
                                 
-                                # Find PDF links with context
-                                for link in soup.find_all('a', href=True):
-                                    href = link['href']
-                                    full_url = urljoin(current_url, href)
-                                    
-                                    # Direct PDF links
-                                    if href.lower().endswith('.pdf'):
-                                        # Get link text and surrounding context for relevance scoring
-                                        link_text = self._extract_link_text(link)
-                                        link_context = self._get_link_context(link, soup)
-                                        pdf_links_with_context.append((full_url, link_text, link_context))
-                                    
-                                    # ArXiv abstract links - convert to PDF URLs
-                                    elif 'arxiv.org/abs/' in full_url:
-                                        # Convert arxiv.org/abs/XXXX.XXXXX to arxiv.org/pdf/XXXX.XXXXX.pdf
-                                        pdf_url = full_url.replace('/abs/', '/pdf/') + '.pdf'
-                                        link_text = self._extract_link_text(link)
-                                        link_context = self._get_link_context(link, soup)
-                                        pdf_links_with_context.append((pdf_url, link_text, link_context))
+                                # ArXiv abstract links - convert to PDF URLs
+                                elif 'arxiv.org/abs/' in full_url:
+                                    # Convert arxiv.org/abs/XXXX.XXXXX to arxiv.org/pdf/XXXX.XXXXX.pdf
+                                    pdf_url = full_url.replace('/abs/', '/pdf/') + '.pdf'
+                                    link_text = self._extract_link_text(link)
+                                    link_context = self._get_link_context(link, soup)
+                                    pdf_links_with_context.append((pdf_url, link_text, link_context))
+                                
+                                elif depth < max_depth and self._is_same_domain(current_netloc, full_url):
+                                    if full_url not in visited:
+                                        visited.add(full_url)
+                                        queue.put_nowait((full_url, depth + 1))
                                     
-                                    elif depth < max_depth and self._is_same_domain(current_url, full_url):
-                                        await crawl_page(full_url, depth + 1)
-                                        
             except Exception as e:
                 logger.error(f"Error crawling {current_url}: {e}")
         
-        await crawl_page(url, 0)
+        async def worker():
+            while True:
+                current_url, depth = await queue.get()
+                try:
+                    await crawl_page(current_url, depth)
+                finally:
+                    queue.task_done()
+        
+        workers = [asyncio.create_task(worker()) for _ in range(MAX_CONCURRENT_CRAWLS)]
+        try:
+            await queue.join()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
         
         # Remove duplicates and prioritize links
         unique_links = {}
@@ -1136,22 +1347,16 @@ class URLCrawler:
     def _is_likely_unrelated_paper(self, pdf_url: str, page_content: str, source_url: str) -> bool:
         """Check if a PDF is likely unrelated to the source page"""
         
-        # Quick checks for obviously unrelated content
-        unrelated_indicators = [
-            'openai', 'dota', '1912.06680',  # Specific to the bug case
-            'gpt', 'language model', 'nlp'   # Common unrelated topics for robotics papers
-        ]
-        
         # If the page is about robotics/self-modeling but PDF is about language models
         if ('robot' in page_content or 'self-model' in page_content or 'lipson' in page_content.lower()):
-            if any(indicator in pdf_url.lower() for indicator in unrelated_indicators):
+            if _UNRELATED_PDF_RE.search(pdf_url):
                 return True
         
         # Check domain mismatch for Nature articles
         if 'nature.com' in source_url and 'arxiv.org' in pdf_url:
             # ArXiv papers found from Nature pages might be legitimate, but check dates
             # Extract potential arXiv ID and check if it's from 2019 (1912.xxxxx)
-            arxiv_match = re.search(r'(\d{4})\.(\d{4,5})', pdf_url)
+            arxiv_match = _ARXIV_ID_RE.search(pdf_url)
             if arxiv_match:
                 year_month = arxiv_match.group(1)
                 if year_month == '1912':  # December 2019 - too old for 2025 Nature paper
@@ -1210,8 +1415,7 @@ class URLCrawler:
             
             # 4. STRUCTURAL INDICATORS (+10-20 points)
             # Look for year patterns (recent papers are often more relevant)
-            import re
-            year_match = re.search(r'(20\d{2})', pdf_url + combined_text)
+            year_match = _YEAR_RE.search(pdf_url + combined_text)
             if year_match:
                 year = int(year_match.group(1))
                 if year >= 2020:  # Recent papers
@@ -1249,15 +1453,20 @@ class URLCrawler:
         
         return [url for url, score in scored_links]
     
-    def _is_same_domain(self, url1: str, url2: str) -> bool:
-        """Check if two URLs are from the same domain"""
+    def _is_same_domain(self, netloc: str, url: str) -> bool:
+        """Check if a URL is on the given domain (a urlsplit netloc)"""
         try:
-            domain1 = urlparse(url1).netloc
-            domain2 = urlparse(url2).netloc
-            return domain1 == domain2
-        except:
+            return urlsplit(url).netloc == netloc
+        except ValueError:
             return False
 
+
+def _convert_pdf_in_worker(cache_dir: str, pdf_path: str, source_url: str) -> str:
+    """Convert one downloaded PDF inside a batch conversion worker process"""
+    # PyMuPDF documents can't be pickled, so each worker opens the file itself
+    return PDFProcessor(Path(cache_dir)).convert_pdf_to_markdown(Path(pdf_path), source_url=source_url)
+
+
 # Initialize MCP server
 server = Server("pdf-processor")
 pdf_processor = PDFProcessor()
@@ -1374,6 +1583,11 @@ async def list_tools() -> List[Tool]:
                         "type": "boolean",
                         "description": "Include PDF metadata in output (default: true)",
                         "default": True
+                    },
+                    "preserve_formatting": {
+                        "type": "boolean",
+                        "description": "Detect headings and bold/italic text from fonts; false converts faster as plain paragraphs (default: true)",
+                        "default": True
                     }
                 },
                 "required": ["url"]
@@ -1498,11 +1712,50 @@ async def call_tool(name: str, arguments: Dict[str, Any]) -> List[TextContent]:
         urls = arguments["urls"]
         include_metadata = arguments.get("include_metadata", True)
         
+        # Download concurrently, capped to match the shared connector's per-host limit
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+        
+        async def download(url: str) -> Optional[Path]:
+            async with semaphore:
+                return await pdf_processor.download_pdf(url)
+        
+        # Each distinct URL is downloaded once, so duplicates don't race on the cache file
+        unique_urls = list(dict.fromkeys(urls))
+        pdf_paths = dict(zip(unique_urls, await asyncio.gather(*(download(url) for url in unique_urls))))
+        
+        # Academic papers go through the marker CLI, which loads its models per run, so
+        # those stay one at a time here. Everything else is CPU-bound PyMuPDF parsing, and
+        # PyMuPDF isn't thread-safe, so those PDFs are parsed in parallel worker processes.
+        # Passing the URL lets later calls hit the markdown cache.
+        downloaded = {url: pdf_path for url, pdf_path in pdf_paths.items() if pdf_path}
+        marker_urls = [
+            url for url, pdf_path in downloaded.items()
+            if MARKER_AVAILABLE and pdf_processor.is_academic_paper(pdf_path, url)
+        ]
+        pooled_urls = [url for url in downloaded if url not in marker_urls]
+        markdowns = {}
+        if pooled_urls:
+            loop = asyncio.get_running_loop()
+            pool = get_conversion_pool()
+            pooled = asyncio.gather(*(
+                loop.run_in_executor(pool, _convert_pdf_in_worker, str(pdf_processor.cache_dir), str(downloaded[url]), url)
+                for url in pooled_urls
+            ))
+        for url in marker_urls:
+            markdowns[url] = pdf_processor.convert_pdf_to_markdown(downloaded[url], source_url=url)
+        if pooled_urls:
+            try:
+                converted = await pooled
+            except BrokenProcessPool:
+                # A worker died; start a fresh pool for the next batch
+                shutdown_conversion_pool()
+                raise
+            markdowns.update(zip(pooled_urls, converted))
+        
         results = []
         for url in urls:
-            pdf_path = await pdf_processor.download_pdf(url)
-            if pdf_path:
-                markdown = pdf_processor.convert_pdf_to_markdown(pdf_path)
+            if url in markdowns:
+                markdown = markdowns[url]
                 results.append(f"## From: {url}\n\n{markdown}\n\n---\n")
             else:
                 results.append(f"## Failed: {url}\n\nCould not download PDF\n\n---\n")
@@ -1515,6 +1768,7 @@ async def call_tool(name: str, arguments: Dict[str, Any]) -> List[TextContent]:
         start_page = arguments.get("start_page", 1)
         end_page = arguments.get("end_page")
         include_metadata = arguments.get("include_metadata", True)
+        preserve_formatting = arguments.get("preserve_formatting", True)
         
         # Download PDF
         pdf_path = await pdf_processor.download_pdf(url)
@@ -1522,7 +1776,9 @@ async def call_tool(name: str, arguments: Dict[str, Any]) -> List[TextContent]:
             return [TextContent(type="text", text=f"Failed to download PDF from {url}")]
         
         # Convert specific pages to markdown (uses PyMuPDF for page ranges)
-        markdown = pdf_processor.convert_pdf_to_markdown(pdf_path, start_page, end_page, source_url=url)
+        markdown = pdf_processor.convert_pdf_to_markdown(
+            pdf_path, start_page, end_page, source_url=url, preserve_formatting=preserve_formatting
+        )
         
         result = f"# Converted from: {url} (Pages {start_page}-{end_page or 'end'})\n\n{markdown}"
         return [TextContent(type="text", text=result)]
@@ -1638,8 +1894,7 @@ async def call_tool(name: str, arguments: Dict[str, Any]) -> List[TextContent]:
 async def main():
     """Main entry point"""
     try:
-        from mcp.server.stdio import stdio_server
-        async with stdio_server() as (read_stream, write_stream):
+        async with mcp.server.stdio.stdio_server() as (read_stream, write_stream):
             await server.run(
                 read_stream,
                 write_stream,
@@ -1648,6 +1903,9 @@ async def main():
     except Exception as e:
         logger.error(f"Server error: {e}")
         raise
+    finally:
+        await close_session()
+        shutdown_conversion_pool()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
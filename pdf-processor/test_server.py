@@ -4,6 +4,7 @@
 import asyncio
 import json
 import sys
+import traceback
 from pathlib import Path
 
 # Add src to path
@@ -71,7 +72,6 @@ async def test_server_initialization():
 
     except Exception as e:
         print(f"✗ ERROR during server initialization: {e}")
-        import traceback
         traceback.print_exc()
         return False
 
@@ -95,7 +95,6 @@ async def test_tool_invocation():
 
     except Exception as e:
         print(f"✗ ERROR during tool invocation test: {e}")
-        import traceback
         traceback.print_exc()
         return False
 
@@ -120,7 +119,6 @@ async def test_server_protocol():
 
     except Exception as e:
         print(f"✗ ERROR during protocol test: {e}")
-        import traceback
         traceback.print_exc()
         return False
 
@@ -0,0 +1,25 @@
+"""
+Shared pytest setup for the PDF processor test suite.
+
+Puts the src directory on sys.path once per session so test modules can
+import mcp_pdf_server directly, and closes the server's shared HTTP
+session after each test.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest_asyncio
+
+src_path = str(Path(__file__).parent.parent / "src")
+if src_path not in sys.path:
+    sys.path.insert(0, src_path)
+
+from mcp_pdf_server import close_session
+
+
+@pytest_asyncio.fixture(autouse=True)
+async def close_shared_http_session():
+    """Close the shared aiohttp session so it doesn't outlive the test's event loop"""
+    yield
+    await close_session()
@@ -6,18 +6,14 @@ Comprehensive tests for PDF processor caching functionality
 import pytest
 import asyncio
 import tempfile
-import time
 import json
 import hashlib
 from pathlib import Path
 from unittest.mock import patch, MagicMock
-import sys
 
-# Add src directory to path to import modules
-src_path = Path(__file__).parent.parent / "src"
-sys.path.insert(0, str(src_path))
+import aiohttp
 
-from mcp_pdf_server import PDFProcessor, MARKER_AVAILABLE
+from mcp_pdf_server import PDFProcessor, MARKER_AVAILABLE, MAX_DOWNLOAD_SIZE, PROCESSOR_VERSION
 
 
 class TestPDFProcessorCaching:
@@ -51,7 +47,7 @@ class TestPDFProcessorCaching:
         # Basic cache key
         key1 = processor._get_conversion_cache_key(url)
         assert isinstance(key1, str)
-        assert len(key1) == 32  # MD5 hash length
+        assert len(key1) == 32  # 16-byte BLAKE2b digest in hex
         
         # Same parameters should generate same key
         key2 = processor._get_conversion_cache_key(url)
@@ -65,6 +61,9 @@ class TestPDFProcessorCaching:
         assert key1 != key4
         assert key3 != key4
         
+        key6 = processor._get_conversion_cache_key(url, preserve_formatting=False)
+        assert key1 != key6
+        
         # Different URLs should generate different keys
         key5 = processor._get_conversion_cache_key("https://other.com/test.pdf")
         assert key1 != key5
@@ -102,6 +101,17 @@ class TestPDFProcessorCaching:
             key2 = processor._get_conversion_cache_key(url)
             assert key1 != key2, "Cache key should change when marker availability changes"
     
+    def test_cache_key_includes_processor_version(self, temp_cache_processor):
+        """Test that cache keys change when the conversion logic version changes"""
+        processor = temp_cache_processor
+        url = "https://example.com/test.pdf"
+        
+        key1 = processor._get_conversion_cache_key(url)
+        
+        with patch('mcp_pdf_server.PROCESSOR_VERSION', PROCESSOR_VERSION + 1):
+            key2 = processor._get_conversion_cache_key(url)
+            assert key1 != key2, "Cache key should change when the processor version changes"
+    
     def test_markdown_cache_storage_and_retrieval(self, temp_cache_processor):
         """Test storing and retrieving markdown from cache"""
         processor = temp_cache_processor
@@ -158,6 +168,7 @@ class TestPDFProcessorCaching:
                 return {
                     "blocks": [
                         {
+                            "type": 0,
                             "lines": [
                                 {
                                     "spans": [
@@ -299,9 +310,10 @@ class TestCachingIntegration:
         mock_response = MagicMock()
         mock_response.status = 200
         mock_response.headers = {'content-type': 'application/pdf'}
-        async def mock_read():
-            return b'%PDF-1.4\nfake pdf content'
-        mock_response.read = mock_read
+        mock_response.content_length = None
+        async def mock_iter_chunked(chunk_size):
+            yield b'%PDF-1.4\nfake pdf content'
+        mock_response.content.iter_chunked = mock_iter_chunked
         mock_get.return_value.__aenter__.return_value = mock_response
         
         # Mock PDF conversion
@@ -311,24 +323,17 @@ class TestCachingIntegration:
             url = "https://example.com/test.pdf"
             
             # First download and conversion
-            start_time = time.time()
             pdf_path1 = await processor.download_pdf(url)
             result1 = processor.convert_pdf_to_markdown(pdf_path1, source_url=url, force_method="pymupdf")
-            first_duration = time.time() - start_time
             
             # Second attempt - should use caches
-            start_time = time.time()
             pdf_path2 = await processor.download_pdf(url)
             result2 = processor.convert_pdf_to_markdown(pdf_path2, source_url=url, force_method="pymupdf")
-            second_duration = time.time() - start_time
             
             # Verify results
             assert result1 == result2 == "Converted markdown content"
             assert pdf_path1 == pdf_path2  # Same cached PDF file
             
-            # Second run should be significantly faster
-            assert second_duration < first_duration
-            
             # Download should only happen once
             assert mock_get.call_count == 1
             
@@ -368,6 +373,113 @@ class TestCachingIntegration:
         assert key1 == key2 == key3
 
 
+class TestPDFDownloadCache:
+    """Test that only complete downloads ever reach the PDF cache"""
+    
+    URL = "https://example.com/paper.pdf"
+    
+    @pytest.fixture
+    def processor(self):
+        """Create a PDF processor with temporary cache directory"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            yield PDFProcessor(cache_dir=Path(temp_dir))
+    
+    @staticmethod
+    def _mock_response(chunks, content_length=None):
+        """Build a mocked 200 PDF response streaming chunks (an exception is raised in turn)"""
+        response = MagicMock()
+        response.status = 200
+        response.headers = {'content-type': 'application/pdf'}
+        response.content_length = content_length
+        async def iter_chunked(chunk_size):
+            for chunk in chunks:
+                if isinstance(chunk, Exception):
+                    raise chunk
+                yield chunk
+        response.content.iter_chunked = iter_chunked
+        return response
+    
+    def _cache_file(self, processor):
+        """Path download_pdf caches URL under"""
+        normalized = processor._normalize_url_for_cache(self.URL)
+        return processor.cache_dir / f"{hashlib.blake2b(normalized.encode(), digest_size=16).hexdigest()}.pdf"
+    
+    @staticmethod
+    def _part_files(processor):
+        return list(processor.cache_dir.glob("*.part"))
+    
+    @patch('aiohttp.ClientSession.get')
+    @pytest.mark.asyncio
+    async def test_interrupted_download_leaves_no_files(self, mock_get, processor):
+        """Test a stream failing mid-download removes its partial file and caches nothing"""
+        mock_get.return_value.__aenter__.return_value = self._mock_response(
+            [b'%PDF-1.4\nfirst chunk', aiohttp.ClientPayloadError("connection reset")]
+        )
+        
+        assert await processor.download_pdf(self.URL) is None
+        assert not self._cache_file(processor).exists()
+        assert self._part_files(processor) == []
+    
+    @patch('aiohttp.ClientSession.get')
+    @pytest.mark.asyncio
+    async def test_empty_cache_file_is_downloaded_again(self, mock_get, processor):
+        """Test an empty cached PDF is discarded rather than served"""
+        cache_file = self._cache_file(processor)
+        cache_file.touch()
+        mock_get.return_value.__aenter__.return_value = self._mock_response([b'%PDF-1.4\ncontent'])
+        
+        assert await processor.download_pdf(self.URL) == cache_file
+        assert mock_get.call_count == 1
+        assert cache_file.read_bytes() == b'%PDF-1.4\ncontent'
+        assert self._part_files(processor) == []
+    
+    @patch('aiohttp.ClientSession.get')
+    @pytest.mark.asyncio
+    async def test_oversized_content_length_rejected(self, mock_get, processor):
+        """Test a Content-Length over MAX_DOWNLOAD_SIZE is refused before streaming"""
+        mock_get.return_value.__aenter__.return_value = self._mock_response(
+            [b'%PDF-1.4\ncontent'], content_length=MAX_DOWNLOAD_SIZE + 1
+        )
+        
+        assert await processor.download_pdf(self.URL) is None
+        assert not self._cache_file(processor).exists()
+        assert self._part_files(processor) == []
+    
+    @patch('mcp_pdf_server.MAX_DOWNLOAD_SIZE', 32)
+    @patch('aiohttp.ClientSession.get')
+    @pytest.mark.asyncio
+    async def test_oversized_stream_without_length_rejected(self, mock_get, processor):
+        """Test a body growing past the cap is cut off when no Content-Length was sent"""
+        mock_get.return_value.__aenter__.return_value = self._mock_response(
+            [b'%PDF-1.4\n' + b'x' * 16, b'y' * 16, b'z' * 16]
+        )
+        
+        assert await processor.download_pdf(self.URL) is None
+        assert not self._cache_file(processor).exists()
+        assert self._part_files(processor) == []
+    
+    @patch('aiohttp.ClientSession.get')
+    @pytest.mark.asyncio
+    async def test_magic_bytes_split_across_chunks(self, mock_get, processor):
+        """Test a PDF whose first chunks are shorter than the %PDF- header is accepted"""
+        mock_get.return_value.__aenter__.return_value = self._mock_response([b'%P', b'D', b'F-1.4\ncontent'])
+        
+        cache_file = self._cache_file(processor)
+        assert await processor.download_pdf(self.URL) == cache_file
+        assert cache_file.read_bytes() == b'%PDF-1.4\ncontent'
+    
+    @patch('aiohttp.ClientSession.get')
+    @pytest.mark.asyncio
+    async def test_non_pdf_body_rejected(self, mock_get, processor):
+        """Test a body not starting with %PDF- is rejected, even when shorter than the header"""
+        for chunks in ([b'<h', b'tml>'], [b'%PD'], [b'%P', b'DX-1.4']):
+            mock_get.return_value.__aenter__.return_value = self._mock_response(chunks)
+            
+            assert await processor.download_pdf(self.URL) is None
+            assert not self._cache_file(processor).exists()
+            assert self._part_files(processor) == []
+
+
 if __name__ == "__main__":
     # Run tests directly if called as script
-    pytest.main([__file__, "-v"])
\ No newline at end of file
+    pytest.main([__file__, "-v"])
@@ -4,18 +4,22 @@ Comprehensive tests for the PDF processor functionality
 """
 
 import asyncio
+import contextlib
 import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+import fitz
+from unittest.mock import patch
 from pathlib import Path
 import tempfile
-import sys
 import os
 from typing import List, Dict, Any
 
-# Add src directory to path to import modules
-src_path = Path(__file__).parent.parent / "src"
-sys.path.insert(0, str(src_path))
-
-from mcp_pdf_server import PDFProcessor, URLCrawler, server, call_tool
+from mcp_pdf_server import (
+    PDFProcessor, URLCrawler, server, call_tool, get_session, close_session,
+    get_conversion_pool, shutdown_conversion_pool, _convert_pdf_in_worker,
+    MAX_CONVERSION_WORKERS,
+)
 
 
 class TestPDFProcessor:
@@ -53,6 +57,138 @@ class TestPDFProcessor:
         assert callable(processor._cache_markdown)
 
 
+class TestPyMuPDFStructure:
+    """Test heading detection and the block-level fast path on a real PDF"""
+    
+    PAGES = 20  # Enough output lines for the table of contents to be generated
+    
+    @pytest.fixture
+    def pdf_path(self, tmp_path: Path) -> Path:
+        """Write a PDF whose pages each have a 20pt heading over 11pt body text"""
+        doc = fitz.open()
+        for n in range(self.PAGES):
+            page = doc.new_page()
+            page.insert_text((72, 72), f"Section {n} Title", fontsize=20)
+            page.insert_text((72, 144), f"Body text for page {n}", fontsize=11)
+        path = tmp_path / "structured.pdf"
+        doc.save(path)
+        doc.close()
+        return path
+    
+    @pytest.fixture
+    def processor(self, tmp_path: Path) -> PDFProcessor:
+        return PDFProcessor(cache_dir=tmp_path / "cache")
+    
+    @staticmethod
+    def _toc_lines(markdown: str) -> List[str]:
+        """Lines of the table of contents at the top of the markdown"""
+        toc = markdown.split("# 📚 Table of Contents\n\n", 1)[1].split("\n\n", 1)[0]
+        return toc.split("\n")
+    
+    def test_font_size_headings(self, processor: PDFProcessor, pdf_path: Path) -> None:
+        """Test large-font blocks become level 1 headings listed in the TOC under their pages."""
+        markdown = processor._convert_pdf_to_markdown_pymupdf(pdf_path)
+        lines = markdown.split("\n")
+        toc = self._toc_lines(markdown)
+        
+        for n in range(self.PAGES):
+            assert f"## 📑 Page {n + 1}" in lines
+            assert f"# Section {n} Title" in lines
+            assert f"Body text for page {n}" in lines
+            # Each page heading is nested under the previous page's section
+            assert toc.index(f"- Section {n} Title") == toc.index(f"  - 📑 Page {n + 1}") + 1
+    
+    def test_blocks_fast_path(self, processor: PDFProcessor, pdf_path: Path) -> None:
+        """Test preserve_formatting=False keeps reading order and figures but emits no font-size headings."""
+        with fitz.open(pdf_path) as doc:
+            sections = processor._organize_text_blocks(doc[0].get_text("blocks"))
+        assert sections == [
+            {'type': 'paragraph', 'text': "Section 0 Title"},
+            {'type': 'paragraph', 'text': "Body text for page 0"},
+        ]
+        
+        markdown = processor._convert_pdf_to_markdown_pymupdf(pdf_path, preserve_formatting=False)
+        lines = markdown.split("\n")
+        toc = self._toc_lines(markdown)
+        
+        assert "# Section 0 Title" not in lines
+        assert "Section 0 Title" in lines
+        assert "  - 📑 Page 1" in toc
+        assert not any("Section" in entry for entry in toc)
+        
+        # Image blocks become figure entries
+        with fitz.open(pdf_path) as doc:
+            pixmap = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 10, 10), False)
+            pixmap.clear_with(128)
+            doc[0].insert_image(fitz.Rect(72, 200, 172, 250), pixmap=pixmap)
+            image_pdf = pdf_path.with_name("with_image.pdf")
+            doc.save(image_pdf)
+        
+        with fitz.open(image_pdf) as doc:
+            _, page_text = next(processor._iter_page_text(doc, 1, 1, "blocks"))
+        sections = processor._organize_text_blocks(page_text)
+        assert {'type': 'figure', 'width': 100, 'height': 50, 'number': 1} in sections
+        
+        markdown = processor._convert_pdf_to_markdown_pymupdf(image_pdf, preserve_formatting=False)
+        assert "**Figure 1**: No caption" in markdown
+        assert "*Dimensions: 100x50 pixels*" in markdown
+
+
+class TestConversionPool:
+    """Test batch conversion worker processes"""
+    
+    def test_worker_converts_through_pool(self, tmp_path: Path) -> None:
+        """Test _convert_pdf_in_worker runs in the shared pool and fills the markdown cache."""
+        doc = fitz.open()
+        doc.new_page().insert_text((72, 72), "Pooled worker text", fontsize=11)
+        pdf_path = tmp_path / "pooled.pdf"
+        doc.save(pdf_path)
+        doc.close()
+        cache_dir = tmp_path / "cache"
+        url = "https://example.com/pooled.pdf"
+        
+        pool = get_conversion_pool()
+        try:
+            assert get_conversion_pool() is pool
+            markdown = pool.submit(_convert_pdf_in_worker, str(cache_dir), str(pdf_path), url).result(timeout=120)
+        finally:
+            shutdown_conversion_pool()
+        
+        assert "Pooled worker text" in markdown
+        processor = PDFProcessor(cache_dir=cache_dir)
+        assert processor._get_cached_markdown(processor._get_conversion_cache_key(url)) == markdown
+    
+    @pytest.mark.asyncio
+    async def test_batch_keeps_marker_out_of_pool(self, tmp_path: Path) -> None:
+        """Test academic papers are converted one at a time in the server, the rest in the pool."""
+        urls = []
+        for name in ("paper", "report"):
+            doc = fitz.open()
+            doc.new_page().insert_text((72, 72), f"{name} body text", fontsize=11)
+            pdf_path = tmp_path / f"{name}.pdf"
+            doc.save(pdf_path)
+            doc.close()
+            urls.append(pdf_path.as_uri())
+        processor = PDFProcessor(cache_dir=tmp_path / "cache")
+        
+        try:
+            with patch("mcp_pdf_server.pdf_processor", processor), \
+                 patch("mcp_pdf_server.MARKER_AVAILABLE", True), \
+                 patch.object(processor, "is_academic_paper", side_effect=lambda path, url="": "paper" in url), \
+                 patch.object(processor, "convert_pdf_to_markdown_with_marker", return_value="marker output") as marker:
+                result = await call_tool("batch_convert_pdfs", {"urls": urls})
+        finally:
+            shutdown_conversion_pool()
+            await close_session()
+        
+        text = result[0].text
+        marker.assert_called_once()
+        assert marker.call_args.args[0].read_bytes() == (tmp_path / "paper.pdf").read_bytes()
+        assert "marker output" in text
+        assert "report body text" in text
+        assert MAX_CONVERSION_WORKERS <= 4
+
+
 class TestURLCrawler:
     """Test URL crawling functionality"""
     
@@ -124,6 +260,82 @@ class TestURLCrawler:
         assert is_unrelated is False, "Should not flag robotics-related paper as unrelated"
 
 
+class TestURLCrawlerQueue:
+    """Test the breadth-first crawl against a local site with a link cycle"""
+    
+    # / -> /a -> /b -> back to / and /a, each page linking one PDF
+    SITE = {
+        "/": '<a href="/a">A</a> <a href="/root.pdf">Root paper</a>',
+        "/a": '<a href="/b">B</a> <a href="/a.pdf">A paper</a> <a href="/">Home</a>',
+        "/b": '<a href="/">Home</a> <a href="/a">A</a> <a href="/b.pdf">B paper</a>',
+    }
+    
+    @contextlib.asynccontextmanager
+    async def serve_site(self):
+        """Serve SITE locally, yielding (base URL, per-path request counts)"""
+        hits: Dict[str, int] = {}
+        
+        async def page(request: web.Request) -> web.Response:
+            hits[request.path] = hits.get(request.path, 0) + 1
+            return web.Response(text=self.SITE[request.path], content_type="text/html")
+        
+        app = web.Application()
+        for path in self.SITE:
+            app.router.add_get(path, page)
+        
+        test_server = TestServer(app)
+        await test_server.start_server()
+        try:
+            yield str(test_server.make_url("")), hits
+        finally:
+            await test_server.close()
+    
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("max_depth,expected_pdfs", [
+        (0, {"/root.pdf"}),
+        (1, {"/root.pdf", "/a.pdf"}),
+        (2, {"/root.pdf", "/a.pdf", "/b.pdf"}),
+    ])
+    async def test_results_per_depth(self, max_depth: int, expected_pdfs: set) -> None:
+        """Test each depth finds the PDFs linked from pages within reach, on every run."""
+        async with self.serve_site() as (base, _):
+            runs = [
+                set(await asyncio.wait_for(URLCrawler().find_pdf_links(base + "/", max_depth), 5))
+                for _ in range(2)
+            ]
+        
+        expected = {base + pdf for pdf in expected_pdfs}
+        assert runs == [expected, expected]
+    
+    @pytest.mark.asyncio
+    async def test_each_page_fetched_once_despite_cycle(self) -> None:
+        """Test the crawl terminates on the link cycle and fetches every page once."""
+        async with self.serve_site() as (base, hits):
+            await asyncio.wait_for(URLCrawler().find_pdf_links(base + "/", max_depth=5), 5)
+        
+        assert hits == {"/": 1, "/a": 1, "/b": 1}
+    
+    @pytest.mark.asyncio
+    async def test_page_error_does_not_stall_crawl(self) -> None:
+        """Test a failing page neither hangs the crawl nor leaves worker tasks behind."""
+        crawler = URLCrawler()
+        extract_link_text = crawler._extract_link_text
+        
+        def failing_extract_link_text(link):
+            if link.get_text(strip=True) == "A paper":
+                raise RuntimeError("broken page")
+            return extract_link_text(link)
+        
+        tasks_before = asyncio.all_tasks()
+        async with self.serve_site() as (base, _):
+            with patch.object(crawler, "_extract_link_text", side_effect=failing_extract_link_text):
+                links = await asyncio.wait_for(crawler.find_pdf_links(base + "/", max_depth=2), 5)
+        
+        # /a fails on its PDF link after queueing /b, so only /a's PDF is lost
+        assert set(links) == {base + "/root.pdf", base + "/b.pdf"}
+        assert asyncio.all_tasks() == tasks_before
+
+
 @pytest.mark.asyncio
 async def test_integration() -> None:
     """Integration test for the full pipeline."""
@@ -200,6 +412,23 @@ class TestVariableScopingFix:
             assert "pdf_processor" not in str(e), f"Unexpected scoping error: {e}"
 
 
+
+class TestSharedSession:
+    """Test the shared aiohttp session's event loop handling"""
+    
+    def test_session_from_previous_loop_is_closed(self) -> None:
+        """Test that a new event loop gets a new session and the stale one is closed."""
+        first = asyncio.run(get_session())
+        second = asyncio.run(get_session())
+        try:
+            assert first is not second
+            assert first.closed
+            assert not second.closed
+        finally:
+            asyncio.run(close_session())
+        assert second.closed
+
+
 if __name__ == "__main__":
     # Run tests directly if called as script
     pytest.main([__file__, "-v"])
\ No newline at end of file